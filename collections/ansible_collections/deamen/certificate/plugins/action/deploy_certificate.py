@@ -1,164 +1,219 @@
+import hashlib
+import re
+import shlex
+
+from ansible.module_utils.common.text.converters import to_bytes, to_text
 from ansible.plugins.action import ActionBase
-from ansible.plugins.action.copy import ActionModule as CopyAction
+
+from ansible_collections.deamen.certificate.plugins.module_utils.certificate import (
+    CERTIFICATE_PARAMS,
+    merge_certificate_params,
+    resolve_certificate,
+)
 
 
 class ActionModule(ActionBase):
     """
-    Deploy a certificate and its key using the 'copy' action plugin.
-    This action module sanitizes parameters and utilizes the 'copy' plugin
-    to deploy certificate and key files with the specified properties.
+    Deploy certificates and their keys with the deploy_certificate module.
+    This action module checks on the controller which files are already up to
+    date and hands every remaining certificate to a single module execution.
     """
 
+    MODULE_NAME = "deamen.certificate.deploy_certificate"
+
     SUPPORTED_PARAMS = [
-        "_original_basename",
+        "attr",
         "attributes",
         "backup",
-        "checksum",
-        "content",
-        "dest",
-        "directory_mode",
-        "follow",
-        "force",
-        "group",
-        "local_follow",
-        "mode",
-        "owner",
-        "remote_src",
         "selevel",
         "serole",
         "setype",
         "seuser",
-        "src",
-        "unsafe_writes",
         "validate",
     ]
 
-    DEFAULT_CERT_DIR = "/etc/pki/tls/certs/"
-    DEFAULT_KEY_DIR = "/etc/pki/tls/private/"
-    DEFAULT_CERT_MODE = "0644"
-    DEFAULT_KEY_MODE = "0600"
-    DEFAULT_OWNER = "root"
-    DEFAULT_GROUP = "root"
+    # File options the remote checks do not compare, the module has to apply them
+    UNCHECKED_PARAMS = [
+        "attr",
+        "attributes",
+        "selevel",
+        "serole",
+        "setype",
+        "seuser",
+    ]
+
+    OCTAL_MODE_RE = re.compile(r"^0?[0-7]{3,4}$")
+    SHA256SUM_LINE_RE = re.compile(r"^([0-9a-f]{64})  (.+)$")
 
     def sanitize_params(self, params):
         """
-        Filters the task parameters to only include those supported by the 'copy' module.
+        Filters the task parameters to only include the file options that
+        apply to every certificate deployed by the module.
         """
         return {k: v for k, v in params.items() if k in self.SUPPORTED_PARAMS}
 
-    def prepare_copy_args(self, dest, content, owner, group, mode):
+    def get_remote_file_states(self, paths):
         """
-        Prepares arguments for the 'copy' action.
+        Collects the SHA-256 checksum, ownership and mode of the given remote
+        paths with a single command instead of one 'stat' module per file.
+        Paths that are missing or could not be inspected are left out.
         """
-        return {
-            "dest": dest,
-            "content": content,
-            "owner": owner,
-            "group": group,
-            "mode": mode,
-        }
+        if not paths:
+            return {}
 
-    def deploy_file(
-        self, copy_action, dest, content, owner, group, mode, tmp, task_vars
-    ):
+        quoted = " ".join(shlex.quote(path) for path in paths)
+        cmd = (
+            f"sha256sum -- {quoted} 2>/dev/null; "
+            f"stat -L -c '%U %u %G %g %a %n' -- {quoted} 2>/dev/null"
+        )
+        res = self._low_level_execute_command(cmd, sudoable=True)
+
+        checksums = {}
+        states = {}
+        for line in to_text(res.get("stdout", "")).splitlines():
+            match = self.SHA256SUM_LINE_RE.match(line)
+            if match:
+                checksums[match.group(2)] = match.group(1)
+                continue
+            fields = line.split(" ", 5)
+            if len(fields) == 6 and fields[5] in checksums:
+                states[fields[5]] = {
+                    "checksum": checksums[fields[5]],
+                    "owner": fields[0:2],
+                    "group": fields[2:4],
+                    "mode": fields[4],
+                }
+
+        return states
+
+    def normalize_mode(self, mode):
         """
-        Deploys a file using the 'copy' action.
+        Converts an octal file mode to an int, None for symbolic modes.
         """
-        copy_args = self.prepare_copy_args(dest, content, owner, group, mode)
-        copy_action._task.args.update(copy_args)
-        return copy_action.run(tmp=tmp, task_vars=task_vars)
+        if isinstance(mode, int):
+            return mode
+        if isinstance(mode, str) and self.OCTAL_MODE_RE.match(mode):
+            return int(mode, 8)
+        return None
 
-    def run(self, tmp=None, task_vars=None):
+    def file_is_current(self, spec, checksum, state):
         """
-        Main execution method for deploying the certificate and its key.
+        Returns whether the remote file already has the expected content,
+        owner, group and mode. The SELinux context and the file attributes are
+        not checked, a file is never current when one of them is set.
         """
-        params = self._task.args
-        is_ca = params.get("is_ca", False)
+        if state is None:
+            return False
 
-        # Validate and extract required parameters
-        name = params.get("name")
-        if not name or (not name.endswith(".crt") and not is_ca):
-            return {
-                "failed": True,
-                "msg": "The 'name' parameter must be a valid .crt filename.",
+        if any(self._task.args.get(k) is not None for k in self.UNCHECKED_PARAMS):
+            return False
+
+        mode = self.normalize_mode(spec["mode"])
+        if mode is None or mode != int(state["mode"], 8):
+            return False
+
+        if str(spec["owner"]) not in state["owner"]:
+            return False
+        if str(spec["group"]) not in state["group"]:
+            return False
+
+        return checksum == state["checksum"]
+
+    def check_certificate(self, files, states):
+        """
+        Returns the result of a certificate whose files are all up to date,
+        None if the module has to deploy it.
+        """
+        result = {"changed": False}
+        for result_key, spec in files.items():
+            checksum = hashlib.sha256(
+                to_bytes(spec["content"], errors="surrogate_or_strict")
+            ).hexdigest()
+            if not self.file_is_current(spec, checksum, states.get(spec["dest"])):
+                return None
+            result[result_key] = {
+                "dest": spec["dest"],
+                "changed": False,
+                "checksum": checksum,
             }
+        return result
 
-        cert_content = params.get("cert_content")
-        key_content = params.get("key_content")
-        if not cert_content or (not key_content and not is_ca):
+    def run(self, tmp=None, task_vars=None):
+        """
+        Deploys the certificate of the task or every item of 'certificates'.
+        """
+        params = self._task.args
+        certificates = params.get("certificates")
+
+        if certificates is None:
+            items = [{k: v for k, v in params.items() if k in CERTIFICATE_PARAMS}]
+        elif not isinstance(certificates, list) or not all(
+            isinstance(item, dict) for item in certificates
+        ):
             return {
                 "failed": True,
-                "msg": "Both 'cert_content' and 'key_content' are required unless 'is_ca' is True.",
+                "msg": "The 'certificates' parameter must be a list of dictionaries.",
             }
-
-        # Extract optional parameters or use defaults
-        cert_dir = params.get("cert_dir", self.DEFAULT_CERT_DIR)
-        key_dir = params.get("key_dir", self.DEFAULT_KEY_DIR)
-        cert_path = f"{cert_dir}/{name}"
-        key_path = f"{key_dir}/{name.replace('.crt', '.key')}"
-
-        cert_owner = params.get("cert_owner", self.DEFAULT_OWNER)
-        cert_group = params.get("cert_group", self.DEFAULT_GROUP)
-        cert_mode = params.get("cert_mode", self.DEFAULT_CERT_MODE)
-
-        key_owner = params.get("key_owner", self.DEFAULT_OWNER)
-        key_group = params.get("key_group", self.DEFAULT_GROUP)
-        key_mode = params.get("key_mode", self.DEFAULT_KEY_MODE)
-
-        # Sanitize the task parameters
-        self._task.args = self.sanitize_params(params)
-
-        # Deploy the certificate file
-        cert_result = {"changed": False}
-        copy_cert_action = CopyAction(
-            self._task,
-            self._connection,
-            self._play_context,
-            self._loader,
-            self._templar,
-            self._shared_loader_obj,
-        )
-        cert_result = self.deploy_file(
-            copy_cert_action,
-            cert_path,
-            cert_content,
-            cert_owner,
-            cert_group,
-            cert_mode,
-            tmp,
-            task_vars,
+        else:
+            items = [merge_certificate_params(params, item) for item in certificates]
+
+        resolved = [resolve_certificate(item) for item in items]
+
+        # A single remote call checks the files of every certificate
+        states = self.get_remote_file_states(
+            [
+                spec["dest"]
+                for files, error in resolved
+                if files
+                for spec in files.values()
+            ]
         )
 
-        key_result = {"changed": False}
-        if not is_ca:
-            # Deploy the key file
-            copy_key_action = CopyAction(
-                self._task,
-                self._connection,
-                self._play_context,
-                self._loader,
-                self._templar,
-                self._shared_loader_obj,
-            )
-            key_result = self.deploy_file(
-                copy_key_action,
-                key_path,
-                key_content,
-                key_owner,
-                key_group,
-                key_mode,
-                tmp,
-                task_vars,
+        results = []
+        pending = []
+        for item, (files, error) in zip(items, resolved):
+            if error:
+                results.append({"failed": True, "msg": error})
+                continue
+            item_result = self.check_certificate(files, states)
+            if item_result is None:
+                pending.append(len(results))
+                results.append(item)
+            else:
+                results.append(item_result)
+
+        if pending:
+            # Every certificate that is not up to date is deployed by one module
+            module_args = self.sanitize_params(params)
+            module_args["certificates"] = [results[i] for i in pending]
+            module_result = self._execute_module(
+                module_name=self.MODULE_NAME,
+                module_args=module_args,
+                task_vars=task_vars,
             )
+            if "results" not in module_result:
+                return module_result
+            for i, item_result in zip(pending, module_result["results"]):
+                results[i] = item_result
+
+        if certificates is None:
+            result = results[0]
+            result.pop("name", None)
+            return result
+
+        for item, item_result in zip(certificates, results):
+            item_result["name"] = item.get("name")
 
-        # Combine results
         result = {
-            "changed": cert_result.get("changed", False)
-            or key_result.get("changed", False),
-            "cert_result": cert_result,
+            "changed": any(r.get("changed", False) for r in results),
+            "results": results,
         }
 
-        if not is_ca:
-            result["key_result"] = key_result
+        failed = [r["name"] for r in results if r.get("failed")]
+        if failed:
+            result["failed"] = True
+            result["msg"] = (
+                f"Failed to deploy certificates: {', '.join(map(str, failed))}"
+            )
 
         return result
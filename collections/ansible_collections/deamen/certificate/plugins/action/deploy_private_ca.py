@@ -1,42 +1,85 @@
 from ansible.plugins.action import ActionBase
 from .deploy_certificate import ActionModule as DeployCertificateAction
 
+from ansible_collections.deamen.certificate.plugins.module_utils.trust_store import (
+    TRUST_STORE_DIRTY_FACT,
+)
+
 
 class ActionModule(ActionBase):
     """
     Action plugin for deploy_private_ca that reuses the deploy_certificate plugin.
+    The trust store is only rebuilt when a CA certificate was changed.
     """
 
+    MODULE_NAME = "deamen.certificate.deploy_private_ca"
+
+    MODULE_PARAMS = ["ca_bundle", "ca_trust_dir", "update_ca_command"]
+
+    def get_private_cas(self, params):
+        """
+        Returns the list of CA certificates of the task as filename and content
+        dicts, or an error message.
+        """
+        private_ca = params.get("private_ca")
+        private_cas = params.get("private_cas")
+
+        if private_ca and private_cas:
+            return None, "'private_ca' and 'private_cas' are mutually exclusive."
+
+        if private_cas is None:
+            if not private_ca:
+                return None, "'private_ca' parameter is required."
+            filename = params.get("filename", "custom-ca.crt")
+            return [{"filename": filename, "content": private_ca}], None
+
+        if not isinstance(private_cas, list) or not all(
+            isinstance(item, dict) and item.get("filename") and item.get("content")
+            for item in private_cas
+        ):
+            return None, (
+                "The 'private_cas' parameter must be a list of dictionaries with "
+                "'filename' and 'content'."
+            )
+
+        return private_cas, None
+
     def run(self, task_vars=None):
         # Extract parameters passed to the task
-        private_ca = self._task.args.get("private_ca")
-        filename = self._task.args.get("filename", "custom-ca.crt")
+        private_cas, error = self.get_private_cas(self._task.args)
         ca_trust_dir = self._task.args.get(
             "ca_trust_dir", "/etc/pki/ca-trust/source/anchors/"
         )
-        update_ca_command = self._task.args.get("update_ca_command", "update-ca-trust")
+        prune = self._task.args.get("prune", False)
+        defer_update = self._task.args.get("defer_update", False)
 
         # Validate required parameters
-        if not private_ca:
-            return {"failed": True, "msg": "'private_ca' parameter is required."}
+        if error:
+            return {"failed": True, "msg": error}
 
         # Define parameters for the deploy_certificate plugin
         deploy_certificate_args = {
-            "name": filename,
-            "cert_content": private_ca,
             "cert_dir": ca_trust_dir,
             "cert_owner": "root",
             "cert_group": "root",
             "cert_mode": "0644",
             "is_ca": True,
-            "update_ca_command": update_ca_command,
         }
+        if "private_cas" in self._task.args:
+            deploy_certificate_args["certificates"] = [
+                {"name": item["filename"], "cert_content": item["content"]}
+                for item in private_cas
+            ]
+        else:
+            deploy_certificate_args["name"] = private_cas[0]["filename"]
+            deploy_certificate_args["cert_content"] = private_cas[0]["content"]
 
         # Update task arguments with deploy_certificate parameters
-        self._task.args.update(deploy_certificate_args)
         new_module_args = self._task.args.copy()
+        self._task.args.update(deploy_certificate_args)
 
-        # Invoke the deploy_certificate action plugin
+        # Invoke the deploy_certificate action plugin, all the CA certificates
+        # are deployed by a single module execution
         deploy_certificate_action = DeployCertificateAction(
             self._task,
             self._connection,
@@ -47,22 +90,57 @@ class ActionModule(ActionBase):
         )
         result = deploy_certificate_action.run(task_vars=task_vars)
 
-        # Execute the module to run update-ca-trust command
+        if result.get("failed"):
+            return result
+
+        cert_results = result.get("results", [result])
+        anchors_changed = any(
+            r.get("cert_result", {}).get("changed") for r in cert_results
+        )
+
+        # Nothing to rebuild when the CA certificates were already deployed
+        # and there are no stale anchors to look for
+        if not anchors_changed and not prune:
+            result["changed"] = False
+            result["msg"] = "Private CA is up to date, trust store not updated."
+            return result
+
+        # Without anchors to prune the module has nothing to do until the flush
+        if defer_update and not prune:
+            result["changed"] = True
+            result["msg"] = "Private CA deployed, trust store update deferred."
+            result["ansible_facts"] = {TRUST_STORE_DIRTY_FACT: True}
+            return result
+
+        # Execute the module to prune stale anchors and run update-ca-trust once
+        module_args = {
+            k: v for k, v in new_module_args.items() if k in self.MODULE_PARAMS
+        }
+        module_args["force_update"] = anchors_changed
+        module_args["defer_update"] = defer_update
+        if prune:
+            module_args["prune"] = True
+            module_args["anchors"] = [item["filename"] for item in private_cas]
+
         module_result = self._execute_module(
-            module_name=self._task.action,
-            module_args={
-                k: v for k, v in new_module_args.items() if k == "update_ca_command"
-            },
+            module_name=self.MODULE_NAME,
+            module_args=module_args,
             task_vars=task_vars,
         )
 
         # Merge the results from deploy_certificate and module
         result.update(module_result)
 
-        # Only if cert_result changed, set changed to True
-        if result.get("cert_result", {}).get("changed"):
+        # Record the deferred update for flush_trust_store
+        if (
+            defer_update
+            and not result.get("failed")
+            and (anchors_changed or result.get("pruned"))
+        ):
+            result.setdefault("ansible_facts", {})[TRUST_STORE_DIRTY_FACT] = True
+
+        # A CA certificate changed even if the extracted bundle did not
+        if anchors_changed and not result.get("failed"):
             result["changed"] = True
-        else:
-            result["changed"] = False
 
         return result
@@ -0,0 +1,45 @@
+from ansible.plugins.action import ActionBase
+
+from ansible_collections.deamen.certificate.plugins.module_utils.trust_store import (
+    TRUST_STORE_DIRTY_FACT,
+)
+
+
+class ActionModule(ActionBase):
+    """
+    Action plugin for flush_trust_store that only runs the module when a
+    deploy_private_ca task deferred a trust store update on the host.
+    """
+
+    MODULE_NAME = "deamen.certificate.flush_trust_store"
+
+    def is_dirty(self, task_vars):
+        """
+        Returns whether a deferred trust store update is pending for the host.
+        """
+        facts = task_vars.get("ansible_facts", {})
+        return bool(
+            facts.get(TRUST_STORE_DIRTY_FACT) or task_vars.get(TRUST_STORE_DIRTY_FACT)
+        )
+
+    def run(self, tmp=None, task_vars=None):
+        task_vars = task_vars or {}
+
+        if not self._task.args.get("force", False) and not self.is_dirty(task_vars):
+            return {
+                "changed": False,
+                "msg": "No deferred update, trust store not updated.",
+            }
+
+        result = self._execute_module(
+            module_name=self.MODULE_NAME,
+            module_args={k: v for k, v in self._task.args.items() if k != "force"},
+            task_vars=task_vars,
+        )
+
+        # Later flushes are no-ops until another update is deferred, the update
+        # is still pending after a check mode run
+        if not result.get("failed") and not self._task.check_mode:
+            result["ansible_facts"] = {TRUST_STORE_DIRTY_FACT: False}
+
+        return result
@@ -1,7 +1,19 @@
+import os
+
 from ansible.plugins.action import ActionBase
 from ansible.errors import AnsibleError
+from ansible.module_utils.parsing.convert_bool import boolean
 from ansible.plugins.loader import connection_loader
 
+from ansible_collections.deamen.certificate.plugins.plugin_utils.cert_cache import (
+    CertificateCache,
+    CertificateCacheError,
+)
+from ansible_collections.deamen.certificate.plugins.plugin_utils.vault_pki import (
+    VaultPKIClient,
+    VaultPKIError,
+)
+
 
 class ActionModule(ActionBase):
     supported_sub_module_args = [
@@ -16,6 +28,14 @@ class ActionModule(ActionBase):
         "auth_method",
     ]
 
+    # Numeric options converted on the controller, with the type they must have
+    NUMERIC_PARAMS = {
+        "concurrency": (int, "an integer"),
+        "renew_before": (int, "an integer"),
+        "retries": (int, "an integer"),
+        "timeout": (float, "a number"),
+    }
+
     def sanitize_params(self, params):
         """
         Filters the task parameters to only include those supported by the 'community.hashi_vault.vault_pki_generate_certificate' module.
@@ -26,7 +46,9 @@ class ActionModule(ActionBase):
         """
         Validates that all required parameters are present.
         """
-        required_params = ["common_name", "engine_mount_point", "role_name", "token"]
+        required_params = ["engine_mount_point", "role_name", "token"]
+        if "certificates" not in params:
+            required_params.insert(0, "common_name")
         missing_params = [p for p in required_params if p not in params]
 
         if missing_params:
@@ -34,6 +56,22 @@ class ActionModule(ActionBase):
                 f"Missing required parameters: {', '.join(missing_params)}"
             )
 
+    def validate_numbers(self, params):
+        """
+        Returns an error message when a numeric option is not a non-negative
+        number, None otherwise.
+        """
+        for name, (convert, kind) in self.NUMERIC_PARAMS.items():
+            if params.get(name) is None:
+                continue
+            try:
+                value = convert(params[name])
+            except (TypeError, ValueError):
+                return f"The '{name}' parameter must be {kind}, got '{params[name]}'."
+            if value < 0:
+                return f"The '{name}' parameter must not be negative."
+        return None
+
     def prepare_module_args(self, params):
         """
         Prepares the arguments for the module execution.
@@ -51,6 +89,132 @@ class ActionModule(ActionBase):
             "on_target": params.get("on_target", False),
         }
 
+    def get_cache(self, params):
+        """
+        Returns the certificate cache when 'cache_dir' is set, None otherwise.
+        """
+        if not params.get("cache_dir"):
+            return None
+
+        try:
+            return CertificateCache(
+                os.path.expanduser(params["cache_dir"]),
+                params.get("cache_key"),
+                vault_addr=params.get("vault_addr") or os.environ.get("VAULT_ADDR"),
+                renew_before=int(
+                    params.get("renew_before", CertificateCache.DEFAULT_RENEW_BEFORE)
+                ),
+            )
+        except CertificateCacheError as e:
+            raise AnsibleError(str(e))
+
+    def cache_response(self, cache, params, request, response, result):
+        """
+        Stores an issued certificate in the cache, a failure is only a warning.
+        """
+        try:
+            cache.put(
+                params["engine_mount_point"], params["role_name"], request, response
+            )
+        except CertificateCacheError as e:
+            result.setdefault("warnings", []).append(str(e))
+
+    def issue_certificates(self, params):
+        """
+        Issues every certificate of the 'certificates' parameter concurrently
+        from the controller, over a pool of keep-alive connections to Vault.
+        """
+        certificates = params["certificates"]
+        if not isinstance(certificates, list) or not all(
+            isinstance(item, dict) and item.get("common_name") for item in certificates
+        ):
+            raise AnsibleError(
+                "The 'certificates' parameter must be a list of dictionaries with "
+                "a 'common_name'."
+            )
+
+        vault_addr = params.get("vault_addr") or os.environ.get("VAULT_ADDR")
+        if not vault_addr:
+            raise AnsibleError(
+                "The 'vault_addr' parameter or the VAULT_ADDR environment variable "
+                "is required with 'certificates'."
+            )
+
+        # Task-level options apply to every item that does not override them
+        requests = []
+        for item in certificates:
+            request = {
+                k: item.get(k, params.get(k)) for k in ("alt_names", "ip_sans", "ttl")
+            }
+            request["common_name"] = item["common_name"]
+            requests.append(request)
+
+        results = [{"common_name": request["common_name"]} for request in requests]
+
+        # Certificates that are still valid for long enough are not issued again
+        cache = self.get_cache(params)
+        pending = []
+        for i, request in enumerate(requests):
+            cached = cache and cache.get(
+                params["engine_mount_point"], params["role_name"], request
+            )
+            if cached:
+                results[i].update({"changed": False, "cached": True, "data": cached})
+            else:
+                pending.append(i)
+
+        result = {"results": results}
+        if not pending:
+            result["changed"] = False
+            return result
+
+        # Nothing is requested from Vault in check mode
+        if self._task.check_mode:
+            for i in pending:
+                results[i]["changed"] = True
+            result["changed"] = True
+            return result
+
+        ca_cert = params.get("ca_cert")
+        try:
+            client = VaultPKIClient(
+                vault_addr,
+                params["token"],
+                ca_cert=os.path.expanduser(ca_cert) if ca_cert else None,
+                validate_certs=boolean(params.get("validate_certs", True)),
+                concurrency=int(
+                    params.get("concurrency", VaultPKIClient.DEFAULT_CONCURRENCY)
+                ),
+                timeout=float(params.get("timeout", VaultPKIClient.DEFAULT_TIMEOUT)),
+                retries=int(params.get("retries", VaultPKIClient.DEFAULT_RETRIES)),
+            )
+        except VaultPKIError as e:
+            raise AnsibleError(str(e))
+
+        with client:
+            responses = client.issue_many(
+                params["engine_mount_point"],
+                params["role_name"],
+                [requests[i] for i in pending],
+            )
+
+        for i, (response, error) in zip(pending, responses):
+            if error:
+                results[i].update({"failed": True, "changed": False, "msg": error})
+                continue
+            results[i].update({"changed": True, "data": response})
+            if cache:
+                self.cache_response(cache, params, requests[i], response, result)
+
+        result["changed"] = any(r["changed"] for r in results)
+
+        failed = [r["common_name"] for r in results if r.get("failed")]
+        if failed:
+            result["failed"] = True
+            result["msg"] = f"Failed to issue certificates: {', '.join(failed)}"
+
+        return result
+
     def run(self, task_vars=None):
         if task_vars is None:
             task_vars = {}
@@ -58,11 +222,28 @@ class ActionModule(ActionBase):
         # Extract and validate parameters
         params = self._task.args
         self.validate_params(params)
+        error = self.validate_numbers(params)
+        if error:
+            return {"failed": True, "msg": error}
+
+        # Batch mode issues every certificate from the controller process
+        if "certificates" in params:
+            return self.issue_certificates(params)
 
         # Prepare module arguments
         module_args = self.prepare_module_args(params)
         sub_module_args = self.sanitize_params(module_args)
 
+        # A cached certificate that is still valid for long enough is reused
+        cache = self.get_cache(params)
+        request = {k: module_args[k] for k in ("common_name", "alt_names", "ip_sans")}
+        if cache:
+            cached = cache.get(
+                params["engine_mount_point"], params["role_name"], request
+            )
+            if cached:
+                return {"changed": False, "cached": True, "data": cached}
+
         # Save the original connection
         original_connection = self._connection
 
@@ -85,4 +266,7 @@ class ActionModule(ActionBase):
             # Restore the original connection
             self._connection = original_connection
 
+        if cache and not result.get("failed") and result.get("data"):
+            self.cache_response(cache, params, request, result["data"], result)
+
         return result
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+Helpers shared by the deploy_certificate action plugin and module.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+CERTIFICATE_PARAMS = [
+    "cert_content",
+    "cert_dir",
+    "cert_group",
+    "cert_mode",
+    "cert_owner",
+    "is_ca",
+    "key_content",
+    "key_dir",
+    "key_group",
+    "key_mode",
+    "key_owner",
+    "name",
+]
+
+DEFAULT_CERT_DIR = "/etc/pki/tls/certs/"
+DEFAULT_KEY_DIR = "/etc/pki/tls/private/"
+DEFAULT_CERT_MODE = "0644"
+DEFAULT_KEY_MODE = "0600"
+DEFAULT_OWNER = "root"
+DEFAULT_GROUP = "root"
+
+
+def merge_certificate_params(defaults, item):
+    """
+    Merges a 'certificates' list item over the task-level parameters.
+    Options the item leaves unset (or sets to None) fall back to the task.
+    """
+    params = {k: v for k, v in defaults.items() if k in CERTIFICATE_PARAMS}
+    params.update({k: v for k, v in item.items() if v is not None})
+    return params
+
+
+def file_spec(dest, content, owner, group, mode):
+    """
+    Describes a file to deploy.
+    """
+    return {
+        "dest": dest,
+        "content": content,
+        "owner": owner,
+        "group": group,
+        "mode": mode,
+    }
+
+
+def resolve_certificate(params):
+    """
+    Validates the parameters of a certificate and resolves the files to deploy.
+    Returns a (files, error) tuple, files maps 'cert_result' and, unless the
+    certificate is a CA, 'key_result' to their file_spec().
+    """
+    is_ca = params.get("is_ca") or False
+
+    # Validate and extract required parameters
+    name = params.get("name")
+    if not name or (not name.endswith(".crt") and not is_ca):
+        return None, "The 'name' parameter must be a valid .crt filename."
+
+    cert_content = params.get("cert_content")
+    key_content = params.get("key_content")
+    if not cert_content or (not key_content and not is_ca):
+        return (
+            None,
+            "Both 'cert_content' and 'key_content' are required unless 'is_ca' is True.",
+        )
+
+    # Extract optional parameters or use defaults
+    cert_dir = params.get("cert_dir") or DEFAULT_CERT_DIR
+    key_dir = params.get("key_dir") or DEFAULT_KEY_DIR
+    cert_path = f"{cert_dir}/{name}"
+    key_path = f"{key_dir}/{name.replace('.crt', '.key')}"
+
+    files = {
+        "cert_result": file_spec(
+            cert_path,
+            cert_content,
+            params.get("cert_owner") or DEFAULT_OWNER,
+            params.get("cert_group") or DEFAULT_GROUP,
+            params.get("cert_mode") or DEFAULT_CERT_MODE,
+        )
+    }
+
+    if not is_ca:
+        files["key_result"] = file_spec(
+            key_path,
+            key_content,
+            params.get("key_owner") or DEFAULT_OWNER,
+            params.get("key_group") or DEFAULT_GROUP,
+            params.get("key_mode") or DEFAULT_KEY_MODE,
+        )
+
+    return files, None
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+Helpers shared by the deploy_private_ca and flush_trust_store plugins.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import os
+
+# Host fact recording that anchors changed and the trust store update was deferred
+TRUST_STORE_DIRTY_FACT = "deamen_trust_store_dirty"
+
+
+def bundle_checksum(module, path):
+    """
+    Returns the SHA-256 checksum of the trust store bundle, None if unknown.
+    """
+    if path and os.path.isfile(path):
+        return module.sha256(path)
+    return None
+
+
+def update_trust_store(module, update_command, ca_bundle=None):
+    """
+    Runs the command updating the system trust store and returns whether it
+    changed. Without a bundle to compare, running the command counts as a change.
+    """
+    before = bundle_checksum(module, ca_bundle)
+
+    # Run the command and capture results
+    rc, stdout, err = module.run_command(update_command)
+
+    # Handle errors if the command fails
+    if rc != 0:
+        module.fail_json(msg=f"Failed to run '{update_command}'. Error: {err}")
+
+    after = bundle_checksum(module, ca_bundle)
+    return ca_bundle is None or before != after
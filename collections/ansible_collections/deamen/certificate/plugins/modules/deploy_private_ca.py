@@ -10,15 +10,59 @@ short_description: Deploy a private CA certificate to a Linux server
 description:
   - Writes the content of a private CA certificate to the system's trust store directory.
   - Updates the system trust store using the `update-ca-trust` command.
+  - The action plugin only runs the update command when a CA certificate was changed, so
+    idempotent runs do not rebuild an identical trust store.
 options:
   private_ca:
-    description: The content of the private CA certificate in PEM format.
-    required: true
+    description:
+      - The content of the private CA certificate in PEM format.
+      - One of O(private_ca) or O(private_cas) is required by the action plugin, the module
+        itself only prunes anchors and updates the trust store.
+      - Mutually exclusive with O(private_cas).
     type: str
   filename:
     description: The filename for the CA certificate.
     default: custom-ca.crt
     type: str
+  private_cas:
+    description:
+      - A list of CA certificates to deploy at once.
+      - The trust store is updated once, only if any of the CA certificates changed.
+      - Mutually exclusive with O(private_ca).
+    type: list
+    elements: dict
+    version_added: 1.4.0
+    suboptions:
+      filename:
+        description: The filename for the CA certificate.
+        required: true
+        type: str
+      content:
+        description: The content of the CA certificate in PEM format.
+        required: true
+        type: str
+  prune:
+    description:
+      - Remove the files of O(ca_trust_dir) that are not deployed by this task, then update the
+        trust store if any file was removed.
+      - Only use it when O(ca_trust_dir) is managed by this single task.
+    type: bool
+    default: false
+    version_added: 1.4.0
+  anchors:
+    description:
+      - Filenames of O(ca_trust_dir) that are kept by O(prune).
+      - Set by the action plugin from O(private_ca) or O(private_cas).
+    type: list
+    elements: str
+    version_added: 1.4.0
+  force_update:
+    description:
+      - Run O(update_ca_command) even when O(prune) did not remove any file.
+      - Set by the action plugin to whether any CA certificate changed.
+    type: bool
+    default: true
+    version_added: 1.4.0
   ca_trust_dir:
     description: The directory where the CA certificate will be stored.
     default: /etc/pki/ca-trust/source/anchors/
@@ -27,6 +71,26 @@ options:
     description: The command to update the system trust store.
     default: update-ca-trust
     type: str
+  ca_bundle:
+    description:
+      - Path of the bundle generated by O(update_ca_command), for example
+        C(/etc/pki/ca-trust/extracted/pem/tls-ca-bundle.pem).
+      - When set, the module only reports a change when the checksum of the bundle changed.
+      - When not set, running O(update_ca_command) is always reported as a change.
+    type: path
+    version_added: 1.4.0
+  defer_update:
+    description:
+      - Do not run O(update_ca_command), only record in the C(deamen_trust_store_dirty) host
+        fact that the trust store has to be updated.
+      - The M(deamen.certificate.flush_trust_store) module then updates the trust store once,
+        however many tasks deferred their update.
+    type: bool
+    default: false
+    version_added: 1.4.0
+attributes:
+  check_mode:
+    support: full
 author: Song Tang (@deamen)
 """
 
@@ -38,15 +102,96 @@ EXAMPLES = """
       MIIDXTCCAkWgAwIBAgIJAL8AO9lD...
       -----END CERTIFICATE-----
     filename: my-custom-ca.crt
+
+- name: Deploy a private CA certificate and report whether the bundle changed
+  deploy_private_ca:
+    private_ca: "{{ lookup('file', 'my-custom-ca.crt') }}"
+    ca_bundle: /etc/pki/ca-trust/extracted/pem/tls-ca-bundle.pem
+
+- name: Deploy the internal CAs with a single trust store update and remove the others
+  deploy_private_ca:
+    private_cas:
+      - filename: root-ca.crt
+        content: "{{ lookup('file', 'root-ca.crt') }}"
+      - filename: issuing-ca.crt
+        content: "{{ lookup('file', 'issuing-ca.crt') }}"
+    prune: true
+
+- name: Deploy CA certificates from several roles and update the trust store once
+  hosts: all
+  tasks:
+    - name: Deploy the root CA
+      deploy_private_ca:
+        private_ca: "{{ lookup('file', 'root-ca.crt') }}"
+        filename: root-ca.crt
+        defer_update: true
+      notify: Update the trust store
+
+    - name: Deploy the partner CA
+      deploy_private_ca:
+        private_ca: "{{ lookup('file', 'partner-ca.crt') }}"
+        filename: partner-ca.crt
+        defer_update: true
+      notify: Update the trust store
+
+  handlers:
+    - name: Update the trust store
+      deamen.certificate.flush_trust_store:
 """
 
+RETURN = """
+pruned:
+  description: Paths of the stale anchors removed by O(prune).
+  returned: when O(prune) is true
+  type: list
+  elements: str
+  sample: ["/etc/pki/ca-trust/source/anchors/old-ca.crt"]
+ansible_facts:
+  description: Facts set when the trust store update is deferred.
+  returned: when O(defer_update) is true and an anchor changed or was pruned
+  type: dict
+  contains:
+    deamen_trust_store_dirty:
+      description: Whether the trust store has to be updated by M(deamen.certificate.flush_trust_store).
+      type: bool
+      sample: true
+"""
+
+import os
+
 from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.deamen.certificate.plugins.module_utils.trust_store import (
+    update_trust_store,
+)
+
+
+def prune_anchors(module, ca_trust_dir, anchors):
+    """
+    Removes the files of the trust directory that are not listed in anchors.
+    Returns the paths that were, or in check mode would be, removed.
+    """
+    if not os.path.isdir(ca_trust_dir):
+        return []
+
+    pruned = []
+    for entry in sorted(os.listdir(ca_trust_dir)):
+        path = os.path.join(ca_trust_dir, entry)
+        if entry in anchors or os.path.isdir(path):
+            continue
+        if not module.check_mode:
+            try:
+                os.remove(path)
+            except OSError as e:
+                module.fail_json(msg=f"Failed to remove '{path}'. Error: {e}")
+        pruned.append(path)
+
+    return pruned
 
 
 def main():
     # Define module arguments
     module_args = {
-        "private_ca": {"type": "str", "required": True},
+        "private_ca": {"type": "str", "required": False},
         "filename": {"type": "str", "required": False, "default": "custom-ca.crt"},
         "ca_trust_dir": {
             "type": "str",
@@ -58,26 +203,73 @@ def main():
             "required": False,
             "default": "update-ca-trust",
         },
+        "ca_bundle": {"type": "path", "required": False},
+        "private_cas": {
+            "type": "list",
+            "elements": "dict",
+            "required": False,
+            "options": {
+                "filename": {"type": "str", "required": True},
+                "content": {"type": "str", "required": True},
+            },
+        },
+        "prune": {"type": "bool", "required": False, "default": False},
+        "anchors": {"type": "list", "elements": "str", "required": False},
+        "force_update": {"type": "bool", "required": False, "default": True},
+        "defer_update": {"type": "bool", "required": False, "default": False},
     }
 
     # Initialize the Ansible module
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=False)
+    module = AnsibleModule(
+        argument_spec=module_args,
+        mutually_exclusive=[("private_ca", "private_cas")],
+        supports_check_mode=True,
+    )
 
     # Command to update the system trust store
     update_command = module.params["update_ca_command"]
+    ca_bundle = module.params["ca_bundle"]
+
+    result = {}
+    if module.params["prune"]:
+        anchors = module.params["anchors"]
+        if anchors is None:
+            anchors = [item["filename"] for item in module.params["private_cas"] or []]
+            if module.params["private_ca"]:
+                anchors.append(module.params["filename"])
+        result["pruned"] = prune_anchors(
+            module, module.params["ca_trust_dir"], set(anchors)
+        )
+
+    # The update is left to the flush_trust_store module
+    if module.params["defer_update"]:
+        module.exit_json(
+            changed=bool(result.get("pruned")),
+            msg="Trust store update deferred.",
+            **result,
+        )
 
-    # Run the command and capture results
-    rc, stdout, err = module.run_command(update_command)
+    # Only update the trust store if an anchor changed or was pruned
+    if not module.params["force_update"] and not result.get("pruned"):
+        module.exit_json(
+            changed=False,
+            msg="No stale anchors, trust store not updated.",
+            **result,
+        )
 
-    # Handle errors if the command fails
-    if rc != 0:
-        module.fail_json(msg=f"Failed to run '{update_command}'. Error: {err}")
+    if module.check_mode:
+        module.exit_json(
+            changed=True,
+            msg=f"Would run '{update_command}' to update the trust store.",
+            **result,
+        )
 
-    # Exit successfully if the command runs without issues
+    changed = update_trust_store(module, update_command, ca_bundle)
 
     module.exit_json(
-        changed=True,
+        changed=changed or bool(result.get("pruned")),
         msg="Private CA deployed successfully and trust store updated.",
+        **result,
     )
 
 
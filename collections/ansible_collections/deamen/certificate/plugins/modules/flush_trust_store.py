@@ -0,0 +1,94 @@
+#!/usr/bin/python
+
+# Copyright: (c) 2024 Song Tang github.com/deamen
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = """
+---
+module: flush_trust_store
+short_description: Run the trust store updates deferred by deploy_private_ca
+version_added: 1.4.0
+description:
+  - Updates the system trust store once when M(deamen.certificate.deploy_private_ca) tasks
+    with O(deamen.certificate.deploy_private_ca#module:defer_update=true) changed an anchor.
+  - The action plugin skips the update unless the C(deamen_trust_store_dirty) host fact is
+    set, and clears the fact once the trust store was updated.
+  - Use it as a handler or as the last task of a play.
+options:
+  update_ca_command:
+    description: The command to update the system trust store.
+    default: update-ca-trust
+    type: str
+  ca_bundle:
+    description:
+      - Path of the bundle generated by O(update_ca_command).
+      - When set, the module only reports a change when the checksum of the bundle changed.
+    type: path
+  force:
+    description: Update the trust store even when no update was deferred.
+    type: bool
+    default: false
+attributes:
+  check_mode:
+    support: full
+author: Song Tang (@deamen)
+"""
+
+EXAMPLES = """
+- name: Update the trust store if any CA certificate deployment deferred it
+  deamen.certificate.flush_trust_store:
+
+- name: Update the Debian trust store
+  deamen.certificate.flush_trust_store:
+    update_ca_command: update-ca-certificates
+    ca_bundle: /etc/ssl/certs/ca-certificates.crt
+"""
+
+RETURN = """
+ansible_facts:
+  description: Facts updated once the trust store was updated.
+  returned: when the trust store was updated
+  type: dict
+  contains:
+    deamen_trust_store_dirty:
+      description: Whether a trust store update is still pending.
+      type: bool
+      sample: false
+"""
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.deamen.certificate.plugins.module_utils.trust_store import (
+    update_trust_store,
+)
+
+
+def main():
+    # Define module arguments
+    module_args = {
+        "update_ca_command": {
+            "type": "str",
+            "required": False,
+            "default": "update-ca-trust",
+        },
+        "ca_bundle": {"type": "path", "required": False},
+        "force": {"type": "bool", "required": False, "default": False},
+    }
+
+    # Initialize the Ansible module
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+
+    update_command = module.params["update_ca_command"]
+
+    if module.check_mode:
+        module.exit_json(
+            changed=True,
+            msg=f"Would run '{update_command}' to update the trust store.",
+        )
+
+    changed = update_trust_store(module, update_command, module.params["ca_bundle"])
+
+    module.exit_json(changed=changed, msg="Trust store updated.")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,12 +10,14 @@ description:
   - Generates a certificate using the HashiCorp Vault PKI backend.
   - Wraps the C(community.hashi_vault.vault_pki_generate_certificate) module for easier usage.
   - Delegates the task to localhost by default and sets authentication mode to C(token).
+  - With O(certificates), issues every certificate concurrently from the controller process
+    over a pool of keep-alive connections to Vault, without running a module.
 version_added: "1.3.0"
 options:
   common_name:
     description:
       - The common name (CN) for the certificate.
-    required: true
+      - Required unless O(certificates) is set.
     type: str
   engine_mount_point:
     description:
@@ -58,11 +60,100 @@ options:
     required: false
     type: bool
     default: false
+  certificates:
+    description:
+      - A list of certificates to issue at once from the controller.
+      - O(alt_names), O(ip_sans) and O(ttl) apply to every item that does not set them.
+      - O(on_target) is ignored, the certificates are always issued by the controller.
+    type: list
+    elements: dict
+    version_added: 1.4.0
+    suboptions:
+      common_name:
+        description: The common name (CN) for the certificate.
+        required: true
+        type: str
+      alt_names:
+        description: A comma-separated list of Subject Alternative Names (SANs) for the certificate.
+        type: str
+      ip_sans:
+        description: A comma-separated list of IP SANs for the certificate.
+        type: str
+      ttl:
+        description: The time-to-live (TTL) duration for the certificate.
+        type: str
+  concurrency:
+    description:
+      - Maximum number of certificates issued in parallel with O(certificates).
+      - Each worker keeps one connection to Vault open for the whole batch.
+    type: int
+    default: 8
+    version_added: 1.4.0
+  timeout:
+    description:
+      - Number of seconds to wait for Vault to answer each request of O(certificates).
+    type: int
+    default: 30
+    version_added: 1.4.0
+  retries:
+    description:
+      - Number of times a request of O(certificates) is retried when Vault cannot be reached,
+        rate limits it (HTTP 429) or fails it (HTTP 5xx).
+      - Retries wait for the C(Retry-After) header of the response when set, otherwise for an
+        exponential backoff with jitter.
+    type: int
+    default: 3
+    version_added: 1.4.0
+  ca_cert:
+    description:
+      - Path of the CA bundle used to verify the certificate of Vault with O(certificates).
+      - Defaults to the system trust store.
+    type: path
+    version_added: 1.4.0
+  validate_certs:
+    description: Whether to verify the certificate of Vault with O(certificates).
+    type: bool
+    default: true
+    version_added: 1.4.0
+  cache_dir:
+    description:
+      - Directory of the controller where issued certificates and their keys are cached,
+        encrypted with O(cache_key).
+      - A cached certificate is returned instead of issuing a new one until its remaining
+        lifetime drops below O(renew_before).
+      - Certificates are cached by O(vault_addr), O(engine_mount_point), O(role_name),
+        O(common_name), O(alt_names) and O(ip_sans).
+      - The cache is disabled when not set.
+    type: path
+    version_added: 1.4.0
+  cache_key:
+    description:
+      - The secret used to encrypt the cached certificates, required with O(cache_dir).
+      - The encryption key is derived from the secret with PBKDF2 and a random salt stored in
+        O(cache_dir).
+      - Use a long random string, for example stored in Ansible Vault.
+    type: str
+    version_added: 1.4.0
+  renew_before:
+    description:
+      - Number of seconds before the expiration of a cached certificate when a new one is
+        issued.
+    type: int
+    default: 604800
+    version_added: 1.4.0
+requirements:
+  - cryptography, when O(cache_dir) is set
 author:
   - Song Tang (@deamen)
 notes:
   - Ensure that the Vault server and PKI engine are configured correctly.
   - Delegation is set to C(localhost) by default.
+  - With O(certificates), O(vault_addr) defaults to the E(VAULT_ADDR) environment variable of
+    the controller.
+  - In check mode with O(certificates), nothing is requested from Vault nor cached, the
+    certificates that are not cached are reported as changed.
+  - To issue the certificates of a whole fleet without depending on C(forks), run a single task
+    with O(certificates) built from the inventory, with C(run_once) and C(delegate_to=localhost).
 seealso:
   - module: community.hashi_vault.vault_pki_generate_certificate
 """
@@ -85,4 +176,59 @@ EXAMPLES = """
     engine_mount_point: pki
     role_name: example-role
     token: "{{ vault_token }}"
+
+- name: Issue the certificates of every web server from a single task
+  gen_cert_from_vault:
+    engine_mount_point: pki
+    role_name: example-role
+    token: "{{ vault_token }}"
+    vault_addr: "https://vault.example.com"
+    ttl: "72h"
+    certificates: "{{ groups['web'] | map('community.general.dict_kv', 'common_name') }}"
+    concurrency: 16
+  run_once: true
+  delegate_to: localhost
+  register: issued
+
+- name: Reuse the certificate issued by a previous run until 30 days before it expires
+  gen_cert_from_vault:
+    common_name: example.com
+    engine_mount_point: pki
+    role_name: example-role
+    token: "{{ vault_token }}"
+    cache_dir: ~/.cache/deamen/vault-certs
+    cache_key: "{{ vault_cert_cache_key }}"
+    renew_before: 2592000
+"""
+
+RETURN = """
+cached:
+  description: Whether the certificate was returned from the cache instead of being issued.
+  returned: when the certificate was found in O(cache_dir)
+  type: bool
+  sample: true
+  version_added: 1.4.0
+results:
+  description: The result of every item of O(certificates), in the same order.
+  returned: when O(certificates) is set
+  type: list
+  elements: dict
+  contains:
+    common_name:
+      description: The common name of the certificate.
+      type: str
+    cached:
+      description: Whether the certificate was returned from the cache.
+      type: bool
+    data:
+      description:
+        - The response of the Vault API, the certificate, its private key and CA chain are in
+          C(data.data).
+      type: dict
+    failed:
+      description: Whether the certificate could not be issued.
+      type: bool
+    msg:
+      description: The reason why the certificate could not be issued.
+      type: str
 """
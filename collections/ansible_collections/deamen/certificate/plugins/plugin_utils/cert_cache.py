@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+Encrypted on-disk cache of the certificates issued by Vault PKI.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+    HAS_CRYPTOGRAPHY = True
+except ImportError:
+    HAS_CRYPTOGRAPHY = False
+
+
+class CertificateCacheError(Exception):
+    """
+    Raised when the certificate cache cannot be used.
+    """
+
+
+def split_sans(sans):
+    """
+    Returns the sorted list of a comma-separated list of SANs.
+    """
+    if not sans:
+        return []
+    if isinstance(sans, str):
+        sans = sans.split(",")
+    return sorted(san.strip() for san in sans if san.strip())
+
+
+class CertificateCache:
+    """
+    Stores the Vault PKI responses of a Vault server on the controller,
+    encrypted with a key derived from the given secret and the random salt of
+    the cache directory. A cached certificate is returned until its remaining
+    lifetime drops below the renewal threshold.
+    """
+
+    DEFAULT_RENEW_BEFORE = 7 * 24 * 3600
+    KDF_ITERATIONS = 480000
+    SALT_FILE = "salt"
+    SALT_SIZE = 16
+
+    def __init__(
+        self, cache_dir, secret, vault_addr=None, renew_before=DEFAULT_RENEW_BEFORE
+    ):
+        if not HAS_CRYPTOGRAPHY:
+            raise CertificateCacheError(
+                "The 'cryptography' Python library is required to cache certificates."
+            )
+        if not secret:
+            raise CertificateCacheError("A key is required to cache certificates.")
+
+        self.cache_dir = cache_dir
+        self.secret = secret.encode("utf-8")
+        self.vault_addr = (vault_addr or "").rstrip("/")
+        self.renew_before = renew_before
+        self._fernet = None
+
+    def read_salt(self, create=False):
+        """
+        Returns the salt of the cache directory, None when there is none yet
+        unless asked to create it. Concurrent writers all end up with the salt
+        linked first.
+        """
+        path = os.path.join(self.cache_dir, self.SALT_FILE)
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            if not create:
+                return None
+
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(os.urandom(self.SALT_SIZE))
+            try:
+                os.link(tmp, path)
+            except FileExistsError:
+                pass
+        finally:
+            os.remove(tmp)
+        with open(path, "rb") as f:
+            return f.read()
+
+    def fernet(self, create=False):
+        """
+        Returns the Fernet instance of the cache, None when the cache has no
+        salt yet unless asked to create it.
+        """
+        if self._fernet is None:
+            salt = self.read_salt(create)
+            if salt is None:
+                return None
+            kdf = PBKDF2HMAC(
+                algorithm=hashes.SHA256(),
+                length=32,
+                salt=salt,
+                iterations=self.KDF_ITERATIONS,
+            )
+            self._fernet = Fernet(base64.urlsafe_b64encode(kdf.derive(self.secret)))
+        return self._fernet
+
+    def key(self, mount_point, role_name, request):
+        """
+        Returns the cache key of a certificate request, the SANs are normalized
+        so their order does not matter.
+        """
+        identity = {
+            "vault_addr": self.vault_addr,
+            "mount_point": mount_point.strip("/"),
+            "role_name": role_name,
+            "common_name": request["common_name"],
+            "alt_names": split_sans(request.get("alt_names")),
+            "ip_sans": split_sans(request.get("ip_sans")),
+        }
+        return hashlib.sha256(
+            json.dumps(identity, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.cert")
+
+    def get(self, mount_point, role_name, request, now=None):
+        """
+        Returns the cached Vault response of a request, None when there is none
+        or the certificate has to be renewed.
+        """
+        try:
+            with open(self.path(self.key(mount_point, role_name, request)), "rb") as f:
+                data = f.read()
+            fernet = self.fernet()
+            if fernet is None:
+                return None
+            response = json.loads(fernet.decrypt(data))
+        except (OSError, ValueError, InvalidToken):
+            return None
+
+        expiration = response.get("data", {}).get("expiration")
+        if not isinstance(expiration, (int, float)):
+            return None
+
+        now = time.time() if now is None else now
+        if expiration - now <= self.renew_before:
+            return None
+
+        return response
+
+    def put(self, mount_point, role_name, request, response):
+        """
+        Stores the Vault response of a request, readable by the owner only.
+        """
+        tmp = None
+        try:
+            os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+            data = self.fernet(create=True).encrypt(
+                json.dumps(response).encode("utf-8")
+            )
+
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self.path(self.key(mount_point, role_name, request)))
+        except OSError as e:
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+            raise CertificateCacheError(f"Failed to cache the certificate: {e}")
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+Minimal client of the HashiCorp Vault PKI secrets engine used by the action
+plugins to issue certificates from the controller process.
+"""
+
+import http.client
+import json
+import random
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlsplit
+
+ISSUE_PARAMS = ["common_name", "alt_names", "ip_sans", "ttl"]
+
+
+class VaultPKIError(Exception):
+    """
+    Raised when Vault cannot be reached or refuses to issue a certificate.
+    """
+
+
+class VaultPKIClient:
+    """
+    Issues certificates with the Vault PKI API over keep-alive connections.
+    Every worker thread keeps its own connection open between requests, so a
+    batch only pays for as many TLS handshakes as it has workers.
+    Requests rate limited (429) or failed by the server (5xx) are retried with
+    an exponential backoff with jitter, honouring the Retry-After header.
+    """
+
+    DEFAULT_CONCURRENCY = 8
+    DEFAULT_TIMEOUT = 30
+    DEFAULT_RETRIES = 3
+    DEFAULT_BACKOFF = 0.5
+    MAX_BACKOFF = 30
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(
+        self,
+        url,
+        token,
+        ca_cert=None,
+        validate_certs=True,
+        timeout=DEFAULT_TIMEOUT,
+        concurrency=DEFAULT_CONCURRENCY,
+        retries=DEFAULT_RETRIES,
+        backoff=DEFAULT_BACKOFF,
+    ):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise VaultPKIError(f"Invalid Vault address '{url}'.")
+
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+        self.concurrency = max(1, concurrency)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+
+        self.ssl_context = None
+        if self.scheme == "https":
+            try:
+                self.ssl_context = ssl.create_default_context(cafile=ca_cert)
+            except OSError as e:
+                raise VaultPKIError(
+                    f"Failed to load the CA certificate '{ca_cert}': {e}"
+                )
+            if not validate_certs:
+                self.ssl_context.check_hostname = False
+                self.ssl_context.verify_mode = ssl.CERT_NONE
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _connect(self):
+        """
+        Returns the connection of the current thread, opening it if needed.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            if self.scheme == "https":
+                connection = http.client.HTTPSConnection(
+                    self.host, self.port, timeout=self.timeout, context=self.ssl_context
+                )
+            else:
+                connection = http.client.HTTPConnection(
+                    self.host, self.port, timeout=self.timeout
+                )
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def _reset(self):
+        """
+        Drops the connection of the current thread after a failure.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def send(self, method, path, payload, headers):
+        """
+        Sends a request on the connection of the current thread and returns the
+        response and its body. A request failing on a connection closed by the
+        server is sent again once on a new connection.
+        """
+        for attempt in range(2):
+            connection = self._connect()
+            try:
+                connection.request(
+                    method, self.base_path + path, body=payload, headers=headers
+                )
+                response = connection.getresponse()
+                return response, response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError) as e:
+                self._reset()
+                if attempt:
+                    raise VaultPKIError(f"Failed to connect to Vault: {e}")
+            except (OSError, http.client.HTTPException) as e:
+                self._reset()
+                raise VaultPKIError(f"Failed to connect to Vault: {e}")
+
+    def retry_delay(self, attempt, response=None):
+        """
+        Returns the number of seconds to wait before retrying a request, the
+        Retry-After header of the response if any, an exponential backoff with
+        full jitter otherwise.
+        """
+        retry_after = response.getheader("Retry-After") if response else None
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.MAX_BACKOFF)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.MAX_BACKOFF, self.backoff * 2**attempt))
+
+    def request(self, method, path, body=None):
+        """
+        Sends a request to the Vault API and returns the decoded JSON response.
+        """
+        headers = {"X-Vault-Token": self.token, "Content-Type": "application/json"}
+        payload = json.dumps(body).encode("utf-8") if body is not None else None
+
+        attempt = 0
+        while True:
+            try:
+                response, data = self.send(method, path, payload, headers)
+            except VaultPKIError:
+                if attempt >= self.retries:
+                    raise
+                time.sleep(self.retry_delay(attempt))
+                attempt += 1
+                continue
+
+            if response.status in self.RETRY_STATUSES and attempt < self.retries:
+                time.sleep(self.retry_delay(attempt, response))
+                attempt += 1
+                continue
+            break
+
+        try:
+            result = json.loads(data) if data else {}
+        except ValueError:
+            result = None
+        if not isinstance(result, dict):
+            result = {}
+
+        if response.status >= 400:
+            errors = result.get("errors") or [response.reason]
+            raise VaultPKIError(
+                f"Vault returned HTTP {response.status}: {'; '.join(map(str, errors))}"
+            )
+
+        return result
+
+    def issue(self, mount_point, role_name, params):
+        """
+        Issues a certificate and returns the raw response of the Vault API.
+        """
+        body = {k: params[k] for k in ISSUE_PARAMS if params.get(k) is not None}
+        path = f"/v1/{quote(mount_point.strip('/'))}/issue/{quote(role_name, safe='')}"
+        return self.request("POST", path, body)
+
+    def issue_many(self, mount_point, role_name, requests):
+        """
+        Issues the certificates of the given requests concurrently.
+        Returns a (response, error) tuple per request, in the same order.
+        """
+
+        def issue_one(params):
+            try:
+                return self.issue(mount_point, role_name, params), None
+            except VaultPKIError as e:
+                return None, str(e)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            return list(executor.map(issue_one, requests))
+
+    def close(self):
+        """
+        Closes the connections of every worker thread.
+        """
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
@@ -0,0 +1,31 @@
+"""Shared fixtures of the deamen.certificate unit tests."""
+
+import os
+import sys
+from unittest import mock
+
+import pytest
+
+# Add the collections path, so the plugins import their module_utils and
+# plugin_utils as installed
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "..", "..", "..", "..")
+)
+
+
+@pytest.fixture
+def make_action():
+    """
+    Returns a factory of action plugins with a stub task, built without the
+    connection, loader and templar a real task would need.
+    """
+
+    def factory(action_class, args=None, check_mode=False):
+        plugin = action_class.__new__(action_class)
+        plugin._task = mock.Mock(args=dict(args or {}), check_mode=check_mode)
+        plugin._connection = plugin._play_context = plugin._loader = None
+        plugin._templar = plugin._shared_loader_obj = None
+        plugin._execute_module = mock.Mock(return_value={"changed": True})
+        return plugin
+
+    return factory
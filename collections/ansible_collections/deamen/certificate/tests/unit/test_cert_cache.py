@@ -0,0 +1,107 @@
+"""Unit tests for the cert_cache plugin utils."""
+
+import os
+import sys
+import time
+
+import pytest
+
+# Add the plugin utils path
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "..", "plugins", "plugin_utils")
+)
+
+from cert_cache import CertificateCache, CertificateCacheError
+
+REQUEST = {"common_name": "a.example.com", "alt_names": "b.example.com,c.example.com"}
+
+
+def response(lifetime):
+    return {
+        "data": {
+            "certificate": "CERT",
+            "private_key": "KEY",
+            "expiration": int(time.time()) + lifetime,
+        }
+    }
+
+
+class TestCertificateCache:
+    """Test the CertificateCache class."""
+
+    def test_hit(self, tmp_path):
+        """A certificate valid for longer than the threshold is returned."""
+        cache = CertificateCache(str(tmp_path), "secret", renew_before=3600)
+        cache.put("pki", "web", REQUEST, response(7200))
+        assert cache.get("pki", "web", REQUEST)["data"]["certificate"] == "CERT"
+
+    def test_sans_order_does_not_matter(self, tmp_path):
+        """The cache key does not depend on the order of the SANs."""
+        cache = CertificateCache(str(tmp_path), "secret", renew_before=0)
+        cache.put("pki", "web", REQUEST, response(7200))
+        request = {
+            "common_name": "a.example.com",
+            "alt_names": "c.example.com, b.example.com",
+        }
+        assert cache.get("pki", "web", request) is not None
+        assert cache.get("pki", "other", request) is None
+
+    def test_renewal_threshold(self, tmp_path):
+        """A certificate expiring within the threshold is not returned."""
+        cache = CertificateCache(str(tmp_path), "secret", renew_before=3600)
+        cache.put("pki", "web", REQUEST, response(1800))
+        assert cache.get("pki", "web", REQUEST) is None
+
+    def test_encrypted_at_rest(self, tmp_path):
+        """The cache files are encrypted and owner readable only."""
+        cache = CertificateCache(str(tmp_path), "secret", renew_before=0)
+        cache.put("pki", "web", REQUEST, response(7200))
+        (path,) = tmp_path.glob("*.cert")
+        assert b"KEY" not in path.read_bytes()
+        assert path.stat().st_mode & 0o777 == 0o600
+
+        other = CertificateCache(str(tmp_path), "other secret", renew_before=0)
+        assert other.get("pki", "web", REQUEST) is None
+
+    def test_key_required(self, tmp_path):
+        """A key is required to use the cache."""
+        with pytest.raises(CertificateCacheError):
+            CertificateCache(str(tmp_path), None)
+
+    def test_vault_addr_in_key(self, tmp_path):
+        """Certificates of different Vault servers are cached apart."""
+        cache = CertificateCache(
+            str(tmp_path), "secret", vault_addr="https://a:8200", renew_before=0
+        )
+        cache.put("pki", "web", REQUEST, response(7200))
+        other = CertificateCache(
+            str(tmp_path), "secret", vault_addr="https://b:8200", renew_before=0
+        )
+        assert other.get("pki", "web", REQUEST) is None
+        same = CertificateCache(
+            str(tmp_path), "secret", vault_addr="https://a:8200/", renew_before=0
+        )
+        assert same.get("pki", "web", REQUEST) is not None
+
+    def test_salted_key(self, tmp_path):
+        """The key is derived with the salt of the cache directory."""
+        first = CertificateCache(str(tmp_path / "a"), "secret", renew_before=0)
+        first.put("pki", "web", REQUEST, response(7200))
+        second = CertificateCache(str(tmp_path / "b"), "secret", renew_before=0)
+        second.put("pki", "web", REQUEST, response(7200))
+        assert (tmp_path / "a" / "salt").read_bytes() != (
+            tmp_path / "b" / "salt"
+        ).read_bytes()
+
+    def test_no_salt_is_a_miss(self, tmp_path):
+        """Nothing is created when reading an empty cache."""
+        cache = CertificateCache(str(tmp_path / "cache"), "secret")
+        assert cache.get("pki", "web", REQUEST) is None
+        assert not (tmp_path / "cache").exists()
+
+    def test_unwritable_cache_dir(self, tmp_path):
+        """A cache directory that cannot be created is a cache error."""
+        (tmp_path / "file").write_text("")
+        cache = CertificateCache(str(tmp_path / "file" / "cache"), "secret")
+        with pytest.raises(CertificateCacheError, match="Failed to cache"):
+            cache.put("pki", "web", REQUEST, response(7200))
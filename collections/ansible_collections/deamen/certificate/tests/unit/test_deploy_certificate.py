@@ -0,0 +1,190 @@
+"""Unit tests for the deploy_certificate action plugin and module."""
+
+import contextlib
+import hashlib
+import json
+import os
+from unittest import mock
+
+import pytest
+from ansible.module_utils import basic
+from ansible.module_utils.basic import AnsibleModule
+
+from ansible_collections.deamen.certificate.plugins.action import (
+    deploy_certificate,
+)
+from ansible_collections.deamen.certificate.plugins.modules import (
+    deploy_certificate as deploy_module,
+)
+
+try:
+    from ansible.module_utils.testing import patch_module_args
+except ImportError:  # ansible-core < 2.19
+
+    @contextlib.contextmanager
+    def patch_module_args(args=None):
+        data = json.dumps({"ANSIBLE_MODULE_ARGS": args or {}}).encode()
+        with mock.patch.object(basic, "_ANSIBLE_ARGS", data):
+            yield
+
+
+SPEC = {
+    "dest": "/etc/pki/tls/certs/a.pem",
+    "mode": "0644",
+    "owner": "root",
+    "group": "0",
+}
+CHECKSUM = hashlib.sha256(b"cert").hexdigest()
+STATE = {
+    "checksum": CHECKSUM,
+    "owner": ["root", "0"],
+    "group": ["root", "0"],
+    "mode": "644",
+}
+
+
+class TestFileIsCurrent:
+    """Test the controller side check of the deployed files."""
+
+    def test_current(self, make_action):
+        """A file with the expected content, owner, group and mode is current."""
+        assert (
+            make_action(deploy_certificate.ActionModule).file_is_current(
+                SPEC, CHECKSUM, STATE
+            )
+            is True
+        )
+
+    def test_selinux_context_not_compared(self, make_action):
+        """The module runs when an SELinux option is set."""
+        plugin = make_action(deploy_certificate.ActionModule, {"setype": "cert_t"})
+        assert plugin.file_is_current(SPEC, CHECKSUM, STATE) is False
+
+    def test_attributes_not_compared(self, make_action):
+        """The module runs when the file attributes are set."""
+        plugin = make_action(deploy_certificate.ActionModule, {"attributes": "+i"})
+        assert plugin.file_is_current(SPEC, CHECKSUM, STATE) is False
+
+
+def module(check_mode=False, **params):
+    """Returns a module with the file options of deploy_certificate."""
+    args = dict(params, _ansible_check_mode=check_mode)
+    with patch_module_args(args):
+        return AnsibleModule(
+            argument_spec={
+                "backup": {"type": "bool", "default": False},
+                "validate": {"type": "str"},
+                "attributes": {"type": "str", "aliases": ["attr"]},
+                "seuser": {"type": "str"},
+                "serole": {"type": "str"},
+                "setype": {"type": "str"},
+                "selevel": {"type": "str"},
+            },
+            supports_check_mode=True,
+        )
+
+
+def file_spec(path, content="cert"):
+    """Returns the spec of a file owned by the user running the tests."""
+    return {
+        "dest": str(path),
+        "content": content,
+        "mode": "0640",
+        "owner": str(os.getuid()),
+        "group": str(os.getgid()),
+    }
+
+
+class TestWriteFile:
+    """Test the atomic write of the module."""
+
+    def test_write(self, tmp_path):
+        """The file is written with its mode, no temporary file is left."""
+        dest = tmp_path / "a.pem"
+        deploy_module.write_file(module(), file_spec(dest), b"cert")
+        assert dest.read_bytes() == b"cert"
+        assert dest.stat().st_mode & 0o7777 == 0o640
+        assert os.listdir(tmp_path) == ["a.pem"]
+
+    def test_attributes_applied_after_rename(self, tmp_path):
+        """The file attributes are set on the destination, not the temporary file."""
+        dest = tmp_path / "a.pem"
+        mod = module(attributes="+i")
+        calls = []
+        mod.set_fs_attributes_if_different = lambda args, changed: calls.append(
+            (args["path"], args["attributes"], os.path.exists(dest))
+        )
+        deploy_module.write_file(mod, file_spec(dest), b"cert")
+        assert calls[0][1] is None and calls[0][2] is False
+        assert calls[-1] == (str(dest), "+i", True)
+
+    def test_validate_failure(self, tmp_path):
+        """A file that fails validation is not written."""
+        dest = tmp_path / "a.pem"
+        dest.write_bytes(b"old")
+        with pytest.raises(OSError, match="Failed to validate"):
+            deploy_module.write_file(
+                module(validate="false %s"), file_spec(dest), b"cert"
+            )
+        assert dest.read_bytes() == b"old"
+        assert os.listdir(tmp_path) == ["a.pem"]
+
+    def test_missing_directory(self, tmp_path):
+        """The destination directory must exist."""
+        with pytest.raises(OSError, match="does not exist"):
+            deploy_module.write_file(
+                module(), file_spec(tmp_path / "missing" / "a.pem"), b"cert"
+            )
+
+
+class TestDeployFile:
+    """Test the deployment of a single file by the module."""
+
+    def test_create(self, tmp_path):
+        """A missing file is written."""
+        dest = tmp_path / "a.pem"
+        result = deploy_module.deploy_file(module(), file_spec(dest))
+        assert result["changed"] is True
+        assert result["checksum"] == CHECKSUM
+        assert dest.read_bytes() == b"cert"
+
+    def test_unchanged(self, tmp_path):
+        """A file with the same content and mode is not rewritten."""
+        dest = tmp_path / "a.pem"
+        dest.write_bytes(b"cert")
+        dest.chmod(0o640)
+        inode = dest.stat().st_ino
+        result = deploy_module.deploy_file(module(), file_spec(dest))
+        assert result["changed"] is False
+        assert dest.stat().st_ino == inode
+
+    def test_mode_fixed(self, tmp_path):
+        """The mode of a file with the same content is fixed in place."""
+        dest = tmp_path / "a.pem"
+        dest.write_bytes(b"cert")
+        dest.chmod(0o600)
+        result = deploy_module.deploy_file(module(), file_spec(dest))
+        assert result["changed"] is True
+        assert dest.stat().st_mode & 0o7777 == 0o640
+
+    def test_backup(self, tmp_path):
+        """The previous content is backed up when asked to."""
+        dest = tmp_path / "a.pem"
+        dest.write_bytes(b"old")
+        result = deploy_module.deploy_file(module(backup=True), file_spec(dest))
+        assert result["changed"] is True
+        with open(result["backup_file"], "rb") as f:
+            assert f.read() == b"old"
+        assert dest.read_bytes() == b"cert"
+
+    def test_check_mode(self, tmp_path):
+        """Nothing is written in check mode."""
+        dest = tmp_path / "a.pem"
+        dest.write_bytes(b"old")
+        result = deploy_module.deploy_file(
+            module(check_mode=True, backup=True), file_spec(dest)
+        )
+        assert result["changed"] is True
+        assert "backup_file" not in result
+        assert dest.read_bytes() == b"old"
+        assert os.listdir(tmp_path) == ["a.pem"]
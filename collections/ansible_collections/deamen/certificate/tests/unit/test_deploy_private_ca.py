@@ -0,0 +1,172 @@
+"""Unit tests for the deploy_private_ca action plugin and module."""
+
+from unittest import mock
+
+import pytest
+
+from ansible_collections.deamen.certificate.plugins.action import deploy_private_ca
+from ansible_collections.deamen.certificate.plugins.module_utils.trust_store import (
+    TRUST_STORE_DIRTY_FACT,
+)
+from ansible_collections.deamen.certificate.plugins.modules import (
+    deploy_private_ca as private_ca_module,
+)
+
+CAS = [
+    {"filename": "a.crt", "content": "CA A"},
+    {"filename": "b.crt", "content": "CA B"},
+]
+
+
+def deployed(*changed):
+    """Returns a deploy_certificate result with a CA per changed flag."""
+    return {
+        "changed": any(changed),
+        "results": [{"cert_result": {"changed": c}} for c in changed],
+    }
+
+
+def run(make_action, args, deploy_result, module_result=None):
+    """
+    Runs the action plugin with a stubbed deploy_certificate plugin, returns
+    the result and the stub of the module execution.
+    """
+    plugin = make_action(deploy_private_ca.ActionModule, args)
+    plugin._execute_module.return_value = module_result or {"changed": True}
+    with mock.patch.object(deploy_private_ca, "DeployCertificateAction") as deploy:
+        deploy.return_value.run.return_value = deploy_result
+        result = plugin.run(task_vars={})
+    return result, plugin._execute_module
+
+
+class TestGetPrivateCas:
+    """Test the parsing of the CA certificates of the task."""
+
+    def test_private_ca(self, make_action):
+        """A single CA is deployed with the default filename."""
+        plugin = make_action(deploy_private_ca.ActionModule)
+        cas, error = plugin.get_private_cas({"private_ca": "CA"})
+        assert error is None
+        assert cas == [{"filename": "custom-ca.crt", "content": "CA"}]
+
+    def test_private_cas(self, make_action):
+        """A list of CAs is returned as is."""
+        plugin = make_action(deploy_private_ca.ActionModule)
+        assert plugin.get_private_cas({"private_cas": CAS}) == (CAS, None)
+
+    @pytest.mark.parametrize(
+        "params, message",
+        [
+            ({}, "is required"),
+            ({"private_ca": "CA", "private_cas": CAS}, "mutually exclusive"),
+            ({"private_cas": [{"filename": "a.crt"}]}, "must be a list"),
+            ({"private_cas": "a.crt"}, "must be a list"),
+        ],
+    )
+    def test_invalid(self, make_action, params, message):
+        """Invalid parameters are reported as an error."""
+        plugin = make_action(deploy_private_ca.ActionModule)
+        cas, error = plugin.get_private_cas(params)
+        assert cas is None
+        assert message in error
+
+
+class TestRun:
+    """Test when the action plugin updates the trust store."""
+
+    def test_unchanged_anchors_skip_update(self, make_action):
+        """The module does not run when no CA certificate changed."""
+        result, execute = run(make_action, {"private_cas": CAS}, deployed(False, False))
+        execute.assert_not_called()
+        assert result["changed"] is False
+
+    def test_changed_anchor_updates(self, make_action):
+        """The trust store is updated once when a CA certificate changed."""
+        result, execute = run(
+            make_action, {"private_cas": CAS}, deployed(False, True), {"changed": False}
+        )
+        execute.assert_called_once()
+        assert execute.call_args.kwargs["module_args"]["force_update"] is True
+        # A changed anchor is a change even when the bundle is identical
+        assert result["changed"] is True
+        assert "ansible_facts" not in result
+
+    def test_prune_runs_module(self, make_action):
+        """The module looks for stale anchors even when no CA changed."""
+        result, execute = run(
+            make_action,
+            {"private_cas": CAS, "prune": True},
+            deployed(False, False),
+            {"changed": False, "pruned": []},
+        )
+        module_args = execute.call_args.kwargs["module_args"]
+        assert module_args["prune"] is True
+        assert module_args["anchors"] == ["a.crt", "b.crt"]
+        assert module_args["force_update"] is False
+        assert result["changed"] is False
+
+    def test_defer_update_sets_fact(self, make_action):
+        """A deferred update is recorded in the dirty fact, the module does not run."""
+        result, execute = run(
+            make_action, {"private_cas": CAS, "defer_update": True}, deployed(True)
+        )
+        execute.assert_not_called()
+        assert result["changed"] is True
+        assert result["ansible_facts"] == {TRUST_STORE_DIRTY_FACT: True}
+
+    def test_defer_update_with_pruned_anchor(self, make_action):
+        """A pruned anchor with a deferred update sets the dirty fact."""
+        result, execute = run(
+            make_action,
+            {"private_cas": CAS, "prune": True, "defer_update": True},
+            deployed(False, False),
+            {"changed": True, "pruned": ["/anchors/old.crt"]},
+        )
+        assert execute.call_args.kwargs["module_args"]["defer_update"] is True
+        assert result["ansible_facts"] == {TRUST_STORE_DIRTY_FACT: True}
+
+    def test_defer_update_unchanged(self, make_action):
+        """Nothing is recorded when no anchor changed."""
+        result, execute = run(
+            make_action,
+            {"private_cas": CAS, "prune": True, "defer_update": True},
+            deployed(False, False),
+            {"changed": False, "pruned": []},
+        )
+        assert "ansible_facts" not in result
+
+    def test_deploy_failure(self, make_action):
+        """A failed deployment is returned without updating the trust store."""
+        result, execute = run(
+            make_action, {"private_ca": "CA"}, {"failed": True, "msg": "boom"}
+        )
+        execute.assert_not_called()
+        assert result["failed"] is True
+
+
+class TestPruneAnchors:
+    """Test the removal of stale anchors by the module."""
+
+    def test_prune(self, tmp_path):
+        """Files that are not anchors are removed, directories are kept."""
+        for name in ("a.crt", "old.crt"):
+            (tmp_path / name).write_text("CA")
+        (tmp_path / "subdir").mkdir()
+
+        module = mock.Mock(check_mode=False)
+        pruned = private_ca_module.prune_anchors(module, str(tmp_path), {"a.crt"})
+        assert pruned == [str(tmp_path / "old.crt")]
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["a.crt", "subdir"]
+
+    def test_prune_check_mode(self, tmp_path):
+        """Nothing is removed in check mode."""
+        (tmp_path / "old.crt").write_text("CA")
+        module = mock.Mock(check_mode=True)
+        pruned = private_ca_module.prune_anchors(module, str(tmp_path), set())
+        assert pruned == [str(tmp_path / "old.crt")]
+        assert (tmp_path / "old.crt").exists()
+
+    def test_missing_directory(self, tmp_path):
+        """A missing trust directory has nothing to prune."""
+        module = mock.Mock(check_mode=False)
+        assert private_ca_module.prune_anchors(module, str(tmp_path / "x"), set()) == []
@@ -0,0 +1,31 @@
+"""Unit tests for the flush_trust_store action plugin."""
+
+from ansible_collections.deamen.certificate.plugins.action import flush_trust_store
+from ansible_collections.deamen.certificate.plugins.module_utils.trust_store import (
+    TRUST_STORE_DIRTY_FACT,
+)
+
+TASK_VARS = {"ansible_facts": {TRUST_STORE_DIRTY_FACT: True}}
+
+
+class TestFlushTrustStore:
+    """Test the deferred update flag handling."""
+
+    def test_flush_clears_fact(self, make_action):
+        """A flush clears the deferred update."""
+        result = make_action(flush_trust_store.ActionModule).run(task_vars=TASK_VARS)
+        assert result["ansible_facts"] == {TRUST_STORE_DIRTY_FACT: False}
+
+    def test_check_mode_keeps_fact(self, make_action):
+        """The deferred update is still pending after a check mode run."""
+        result = make_action(flush_trust_store.ActionModule, check_mode=True).run(
+            task_vars=TASK_VARS
+        )
+        assert "ansible_facts" not in result
+
+    def test_not_dirty(self, make_action):
+        """The module does not run without a deferred update."""
+        plugin = make_action(flush_trust_store.ActionModule)
+        result = plugin.run(task_vars={})
+        assert result["changed"] is False
+        plugin._execute_module.assert_not_called()
@@ -0,0 +1,79 @@
+"""Unit tests for the gen_cert_from_vault action plugin."""
+
+from unittest import mock
+
+import pytest
+
+from ansible_collections.deamen.certificate.plugins.action import (
+    gen_cert_from_vault,
+)
+
+PARAMS = {
+    "certificates": [{"common_name": "a.example.com"}, {"common_name": "b.example"}],
+    "engine_mount_point": "pki",
+    "role_name": "web",
+    "token": "s.test-token",
+    "vault_addr": "http://127.0.0.1:9",
+}
+
+
+class TestIssueCertificates:
+    """Test the batch mode of the action plugin."""
+
+    def test_check_mode_does_not_issue(self, make_action):
+        """No request is sent to Vault in check mode."""
+        with mock.patch.object(gen_cert_from_vault, "VaultPKIClient") as client:
+            result = make_action(
+                gen_cert_from_vault.ActionModule, check_mode=True
+            ).issue_certificates(PARAMS)
+
+        client.assert_not_called()
+        assert result["changed"] is True
+        assert [r["changed"] for r in result["results"]] == [True, True]
+        assert all("data" not in r for r in result["results"])
+
+    def test_check_mode_does_not_cache(self, make_action, tmp_path):
+        """Nothing is written to the cache in check mode."""
+        params = dict(PARAMS, cache_dir=str(tmp_path / "cache"), cache_key="secret")
+        with mock.patch.object(gen_cert_from_vault, "VaultPKIClient") as client:
+            make_action(
+                gen_cert_from_vault.ActionModule, check_mode=True
+            ).issue_certificates(params)
+
+        client.assert_not_called()
+        assert not (tmp_path / "cache").exists()
+
+
+class TestValidateNumbers:
+    """Test the validation of the numeric options."""
+
+    @pytest.mark.parametrize(
+        "name, value",
+        [
+            ("concurrency", "many"),
+            ("timeout", "1m"),
+            ("retries", "1.5"),
+            ("renew_before", ""),
+        ],
+    )
+    def test_invalid(self, make_action, name, value):
+        """A value that is not a number fails the task."""
+        plugin = make_action(
+            gen_cert_from_vault.ActionModule, dict(PARAMS, **{name: value})
+        )
+        result = plugin.run(task_vars={})
+        assert result["failed"] is True
+        assert f"'{name}'" in result["msg"]
+
+    def test_negative(self, make_action):
+        """A negative value fails the task."""
+        plugin = make_action(gen_cert_from_vault.ActionModule, dict(PARAMS, retries=-1))
+        result = plugin.run(task_vars={})
+        assert result["failed"] is True
+        assert "must not be negative" in result["msg"]
+
+    def test_valid(self, make_action):
+        """Numbers given as strings by templates are accepted."""
+        plugin = make_action(gen_cert_from_vault.ActionModule)
+        params = dict(PARAMS, concurrency="4", timeout="2.5", retries=0)
+        assert plugin.validate_numbers(params) is None
@@ -0,0 +1,168 @@
+"""Unit tests for the vault_pki plugin utils."""
+
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Add the plugin utils path
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "..", "plugins", "plugin_utils")
+)
+
+from vault_pki import VaultPKIClient, VaultPKIError
+
+TOKEN = "s.test-token"
+
+
+class FakeVaultHandler(BaseHTTPRequestHandler):
+    """Stand-in for the Vault PKI issue endpoint."""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length))
+
+        with self.server.lock:
+            throttled = self.server.throttle > 0
+            self.server.throttle -= 1
+
+        if throttled:
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif body["common_name"].startswith("down"):
+            self.send_json(503, {"errors": ["Vault is sealed"]})
+        elif self.headers.get("X-Vault-Token") != TOKEN:
+            self.send_json(403, {"errors": ["permission denied"]})
+        elif self.path != "/v1/pki/issue/web":
+            self.send_json(404, {"errors": ["no handler for route"]})
+        elif body["common_name"].startswith("bad"):
+            self.send_json(400, {"errors": ["common name not allowed"]})
+        else:
+            self.server.requests.append(body)
+            self.send_json(
+                200,
+                {
+                    "data": {
+                        "certificate": f"CERT {body['common_name']}",
+                        "private_key": f"KEY {body['common_name']}",
+                        "serial_number": "01",
+                    }
+                },
+            )
+
+
+@pytest.fixture
+def vault():
+    """Runs the Vault stand-in on a free local port."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeVaultHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.throttle = 0
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def vault_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class TestVaultPKIClient:
+    """Test the VaultPKIClient class."""
+
+    def test_issue(self, vault):
+        """A certificate is issued with the given parameters."""
+        with VaultPKIClient(vault_url(vault), TOKEN) as client:
+            response = client.issue(
+                "pki", "web", {"common_name": "a.example.com", "ttl": "1h"}
+            )
+        assert response["data"]["certificate"] == "CERT a.example.com"
+        assert vault.requests == [{"common_name": "a.example.com", "ttl": "1h"}]
+
+    def test_issue_many_reuses_connections(self, vault):
+        """A batch opens at most one connection per worker."""
+        requests = [{"common_name": f"host{i}.example.com"} for i in range(40)]
+        with VaultPKIClient(vault_url(vault), TOKEN, concurrency=4) as client:
+            responses = client.issue_many("pki", "web", requests)
+
+        assert [r["data"]["certificate"] for r, _ in responses] == [
+            f"CERT host{i}.example.com" for i in range(40)
+        ]
+        assert all(error is None for _, error in responses)
+        assert vault.connections <= 4
+
+    def test_issue_many_reports_errors(self, vault):
+        """A refused certificate does not fail the others."""
+        requests = [{"common_name": "a.example.com"}, {"common_name": "bad.example"}]
+        with VaultPKIClient(vault_url(vault), TOKEN) as client:
+            responses = client.issue_many("pki", "web", requests)
+
+        assert responses[0][1] is None
+        assert responses[1] == (
+            None,
+            "Vault returned HTTP 400: common name not allowed",
+        )
+
+    def test_retry_after_rate_limit(self, vault):
+        """Rate limited requests are retried after the Retry-After delay."""
+        vault.throttle = 2
+        with VaultPKIClient(vault_url(vault), TOKEN, retries=2) as client:
+            response = client.issue("pki", "web", {"common_name": "a.example.com"})
+        assert response["data"]["certificate"] == "CERT a.example.com"
+
+    def test_retries_exhausted(self, vault):
+        """The last error is raised once every retry failed."""
+        with VaultPKIClient(vault_url(vault), TOKEN, retries=2, backoff=0) as client:
+            with pytest.raises(VaultPKIError, match="HTTP 503: Vault is sealed"):
+                client.issue("pki", "web", {"common_name": "down.example.com"})
+
+    def test_unreachable(self):
+        """Connection failures are raised as VaultPKIError."""
+        client = VaultPKIClient("http://127.0.0.1:9", TOKEN, retries=1, backoff=0)
+        with pytest.raises(VaultPKIError, match="Failed to connect"):
+            client.issue("pki", "web", {"common_name": "a.example.com"})
+
+    def test_invalid_token(self, vault):
+        """Vault errors are raised as VaultPKIError."""
+        with VaultPKIClient(vault_url(vault), "wrong") as client:
+            with pytest.raises(VaultPKIError, match="permission denied"):
+                client.issue("pki", "web", {"common_name": "a.example.com"})
+
+    def test_invalid_url(self):
+        """The Vault address must be an HTTP(S) URL."""
+        with pytest.raises(VaultPKIError):
+            VaultPKIClient("vault.example.com", TOKEN)
+
+    def test_missing_ca_cert(self, tmp_path):
+        """A missing CA certificate is a client error."""
+        with pytest.raises(VaultPKIError, match="CA certificate"):
+            VaultPKIClient(
+                "https://vault.example.com", TOKEN, ca_cert=str(tmp_path / "ca.pem")
+            )
@@ -0,0 +1,70 @@
+from ansible.plugins.action import ActionBase
+
+
+class ActionModule(ActionBase):
+    """
+    Action plugin for check_is_container that answers from the facts of the
+    host when they are conclusive, and only runs the module otherwise.
+    """
+
+    MODULE_NAME = "deamen.general.check_is_container"
+    FACT_NAME = "deamen_container"
+
+    # Values of ansible_virtualization_type detected from the marker files of
+    # the module, the other container types do not make is_container true
+    VIRTUALIZATION_ENGINES = {
+        "docker": "docker",
+        "podman": "podman",
+    }
+
+    def from_fact(self, task_vars):
+        """
+        Returns the result stored in the deamen_container fact, None when the
+        fact is not set.
+        """
+        facts = task_vars.get("ansible_facts", {})
+        fact = facts.get(self.FACT_NAME) or task_vars.get(self.FACT_NAME)
+        if not isinstance(fact, dict) or "is_container" not in fact:
+            return None
+
+        result = {"marker_found": [], "container_engine": None, "signals": []}
+        result.update(fact)
+        result["source"] = "fact"
+        return result
+
+    def from_virtualization(self, task_vars):
+        """
+        Returns the result of the gathered virtualization facts when they report
+        a docker or podman guest, None otherwise. A host or another type is not
+        conclusive, some engines are not detected by the facts.
+        The result lacks cgroup_version and is_ostree, so it is not stored as
+        the fact, a later task still runs the module to get them.
+        """
+        facts = task_vars.get("ansible_facts", {})
+        role = facts.get("virtualization_role")
+        vtype = facts.get("virtualization_type")
+        if role != "guest" or vtype not in self.VIRTUALIZATION_ENGINES:
+            return None
+
+        return {
+            "is_container": True,
+            "marker_found": [],
+            "container_engine": self.VIRTUALIZATION_ENGINES[vtype],
+            "signals": [f"ansible_virtualization_type={vtype}"],
+            "source": "virtualization",
+        }
+
+    def run(self, tmp=None, task_vars=None):
+        task_vars = task_vars or {}
+
+        if not self._task.args.get("force", False):
+            result = self.from_fact(task_vars) or self.from_virtualization(task_vars)
+            if result:
+                result["changed"] = False
+                return result
+
+        return self._execute_module(
+            module_name=self.MODULE_NAME,
+            module_args={k: v for k, v in self._task.args.items() if k != "force"},
+            task_vars=task_vars,
+        )
@@ -10,22 +10,65 @@ short_description: Check if running inside a container (Docker, Podman, etc.)
 description:
   - Checks for well-known container marker files to determine if the host is running inside a container.
   - This is more reliable than ansible_virtualization_type for some container engines (e.g., buildah).
+  - Also identifies the container engine, the cgroup version and ostree based systems in the same
+    run, so roles do not need separate tasks to detect them.
+  - The result is also returned as the C(deamen_container) fact, so it is stored by the fact
+    cache plugins and later plays can reuse it instead of running the module again.
+  - The action plugin answers without running the module when the C(deamen_container) fact is
+    already set, or when the gathered facts report a V(docker) or V(podman) guest in
+    C(ansible_virtualization_type). It runs the module when the facts are missing or do not
+    report one of them, as some engines are not detected by them.
+  - An answer from the gathered facts is partial, without RV(cgroup_version) and RV(is_ostree),
+    and is not stored as the C(deamen_container) fact. Set O(force) when they are needed.
 version_added: "1.0.0"
+options:
+  force:
+    description:
+      - Run the module even when the answer is known from the facts.
+    type: bool
+    default: false
+    version_added: "1.1.0"
+attributes:
+  action:
+    support: full
+  check_mode:
+    support: full
 author:
   - deamen(@deamen)
 notes:
   - Looks for /.dockerenv and /run/.containerenv marker files.
+  - The container engine is detected from the marker files, the C(container) variable of the
+    environment of PID 1, /run/systemd/container, the Kubernetes service account and the cgroup
+    of PID 1, in this order. The environment of PID 1 is only readable by root.
+  - The cgroup version is detected from the layout of /sys/fs/cgroup.
 """
 
 EXAMPLES = r"""
 - name: Check if running in a container
   deamen.general.check_is_container:
   register: container_check
+
+- name: Check if running in a container, unless the fact is already cached
+  deamen.general.check_is_container:
+  when: deamen_container is not defined
+
+- name: Use the cached fact
+  ansible.builtin.debug:
+    msg: "Running in a container"
+  when: deamen_container.is_container
+
+- name: Detect the container again, ignoring the facts
+  deamen.general.check_is_container:
+    force: true
 """
 
 RETURN = r"""
 is_container:
-  description: Whether the host is running inside a container.
+  description:
+    - Whether the host is running inside an application container, that is whether one of the
+      marker files was found.
+    - System containers such as LXC or systemd-nspawn, and other signals such as an overlay root,
+      are only reported in RV(container_engine) and RV(signals).
   returned: always
   type: bool
   sample: true
@@ -35,6 +78,59 @@ marker_found:
   type: list
   elements: str
   sample: ["/.dockerenv"]
+container_engine:
+  description:
+    - The container engine, for example V(docker), V(podman), V(lxc), V(systemd-nspawn) or
+      V(kubernetes).
+    - Also set for system containers, even when RV(is_container) is false.
+    - V(null) when not running in a container or when the engine is unknown.
+  returned: always
+  type: str
+  version_added: "1.1.0"
+  sample: podman
+source:
+  description:
+    - Where the answer comes from, V(module), V(fact) for the C(deamen_container) fact or
+      V(virtualization) for the gathered virtualization facts.
+  returned: always
+  type: str
+  version_added: "1.1.0"
+  sample: fact
+cgroup_version:
+  description:
+    - The cgroup version mounted on /sys/fs/cgroup, V(2) for the unified hierarchy, V(1) for the
+      legacy and hybrid hierarchies.
+    - V(null) when /sys/fs/cgroup is not mounted.
+  returned: when the module runs or from a fact set by the module
+  type: int
+  version_added: "1.1.0"
+  sample: 2
+is_ostree:
+  description: Whether the host is booted from an ostree deployment.
+  returned: when the module runs or from a fact set by the module
+  type: bool
+  version_added: "1.1.0"
+  sample: false
+signals:
+  description: The container signals found, for troubleshooting the detection.
+  returned: always
+  type: list
+  elements: str
+  version_added: "1.1.0"
+  sample: ["/run/.containerenv", "pid1 environ container=podman", "overlay root filesystem"]
+ansible_facts:
+  description: Facts to add to ansible_facts.
+  returned: when the module runs
+  type: dict
+  version_added: "1.1.0"
+  contains:
+    deamen_container:
+      description:
+        - The RV(is_container), RV(marker_found), RV(container_engine), RV(cgroup_version),
+          RV(is_ostree) and RV(signals) results.
+      type: dict
+      sample: {"is_container": true, "marker_found": ["/.dockerenv"], "container_engine": "docker",
+               "cgroup_version": 2, "is_ostree": false, "signals": ["/.dockerenv"]}
 """
 
 from ansible.module_utils.basic import AnsibleModule
@@ -45,13 +141,137 @@ CONTAINER_MARKERS = [
     "/run/.containerenv",
 ]
 
+# Engine of each marker file
+MARKER_ENGINES = {
+    "/.dockerenv": "docker",
+    "/run/.containerenv": "podman",
+}
+
+# Engine of the cgroup paths of PID 1, the first match wins
+CGROUP_ENGINES = [
+    ("kubepods", "kubernetes"),
+    ("/docker", "docker"),
+    ("libpod", "podman"),
+    ("/lxc", "lxc"),
+    ("machine.slice", "systemd-nspawn"),
+    ("containerd", "containerd"),
+]
+
+KUBERNETES_SECRETS = "/var/run/secrets/kubernetes.io"
+SYSTEMD_CONTAINER = "/run/systemd/container"
+OSTREE_BOOTED = "/run/ostree-booted"
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+
+def read_file(path):
+    """
+    Return the content of a file, None when it cannot be read.
+    """
+    try:
+        with open(path, "rb") as f:
+            return f.read().decode("utf-8", "replace")
+    except (IOError, OSError):
+        return None
+
+
+def pid1_environ():
+    """
+    Return the environment of PID 1 as a dict, empty when it cannot be read.
+    """
+    content = read_file("/proc/1/environ") or ""
+    return dict(var.split("=", 1) for var in content.split("\0") if "=" in var)
+
+
+def containerenv_engine():
+    """
+    Return the engine named in /run/.containerenv (podman, buildah...), podman
+    when the file does not name one.
+    """
+    for line in (read_file("/run/.containerenv") or "").splitlines():
+        if line.startswith("engine="):
+            engine = line.split("=", 1)[1].strip('"')
+            return engine.split("-", 1)[0] or "podman"
+    return "podman"
+
+
+def overlay_root():
+    """
+    Return whether the root filesystem is an overlay, as for most container
+    images.
+    """
+    for line in (read_file("/proc/self/mountinfo") or "").splitlines():
+        fields = line.split(" - ", 1)
+        if len(fields) != 2:
+            continue
+        mount = fields[0].split()
+        if len(mount) > 4 and mount[4] == "/":
+            return fields[1].split()[0] == "overlay"
+    return False
+
+
+def cgroup_version():
+    """
+    Return the cgroup version mounted on /sys/fs/cgroup, None if there is none.
+    """
+    if os.path.exists(os.path.join(CGROUP_ROOT, "cgroup.controllers")):
+        return 2
+    if os.path.isdir(CGROUP_ROOT) and os.listdir(CGROUP_ROOT):
+        return 1
+    return None
+
+
+def detect(found):
+    """
+    Collect the container signals and return the container engine, None when
+    there is none, and the list of signals.
+    """
+    signals = list(found)
+    engines = []
+
+    for marker in found:
+        if marker == "/run/.containerenv":
+            engines.append(containerenv_engine())
+        else:
+            engines.append(MARKER_ENGINES[marker])
+
+    environ = pid1_environ()
+    if environ.get("container"):
+        signals.append(f"pid1 environ container={environ['container']}")
+        engines.append(environ["container"])
+
+    systemd_container = (read_file(SYSTEMD_CONTAINER) or "").strip()
+    if systemd_container:
+        signals.append(f"{SYSTEMD_CONTAINER}={systemd_container}")
+        engines.append(systemd_container)
+
+    if "KUBERNETES_SERVICE_HOST" in environ or os.path.isdir(KUBERNETES_SECRETS):
+        signals.append("kubernetes service account")
+        # A pod runs on top of another engine, Kubernetes is what matters
+        engines.insert(0, "kubernetes")
+
+    for line in (read_file("/proc/1/cgroup") or "").splitlines():
+        path = line.split(":", 2)[-1]
+        for pattern, engine in CGROUP_ENGINES:
+            if pattern in path:
+                signals.append(f"pid1 cgroup {path}")
+                engines.append(engine)
+                break
+
+    if overlay_root():
+        signals.append("overlay root filesystem")
+
+    return (engines[0] if engines else None), signals
+
 
 def run_module():
-    module_args = dict()
+    module_args = dict(
+        force=dict(type="bool", default=False),
+    )
     result = dict(
         changed=False,
         is_container=False,
         marker_found=[],
+        source="module",
     )
 
     module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
@@ -60,8 +280,29 @@ def run_module():
     for marker in CONTAINER_MARKERS:
         if os.path.exists(marker):
             found.append(marker)
+    engine, signals = detect(found)
+
     result["marker_found"] = found
+    # Only the marker files of application containers make is_container true,
+    # roles rely on it to skip the setup of a full system
     result["is_container"] = bool(found)
+    result["container_engine"] = engine
+    result["cgroup_version"] = cgroup_version()
+    result["is_ostree"] = os.path.exists(OSTREE_BOOTED)
+    result["signals"] = signals
+    result["ansible_facts"] = dict(
+        deamen_container=dict(
+            (k, result[k])
+            for k in (
+                "is_container",
+                "marker_found",
+                "container_engine",
+                "cgroup_version",
+                "is_ostree",
+                "signals",
+            )
+        )
+    )
 
     module.exit_json(**result)
 
@@ -0,0 +1,253 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+
+DOCUMENTATION = r"""
+---
+module: package_set
+short_description: Install a set of packages in a single transaction
+description:
+  - Ensures that every package of a list is installed.
+  - The installed packages are queried with a single C(rpm), C(dpkg-query) or C(apk) command, and
+    only the missing ones are installed, in a single C(dnf), C(apt-get) or C(apk) transaction.
+  - On Debian based systems, a second C(dpkg-query) looks up the virtual packages provided by the
+    installed packages when some names are not installed packages.
+  - Unlike a loop over M(ansible.builtin.package), the repository metadata and the package
+    database are only loaded once for the whole list.
+version_added: "1.1.0"
+author:
+  - deamen(@deamen)
+options:
+  names:
+    description:
+      - The packages to install.
+      - On RPM based systems, any capability provided by a package can be given, for example a
+        file path.
+      - Duplicates are ignored, so the package lists of several roles can be concatenated.
+    type: list
+    elements: str
+    required: true
+    aliases: [name]
+  manager:
+    description:
+      - The package manager to use.
+      - V(auto) uses the first one found among C(dnf5), C(dnf), C(microdnf), C(yum), C(apt-get)
+        and C(apk).
+    type: str
+    choices: [auto, dnf5, dnf, microdnf, yum, apt-get, apk]
+    default: auto
+attributes:
+  check_mode:
+    support: full
+notes:
+  - Only installs packages, use M(ansible.builtin.package) to remove or upgrade them.
+"""
+
+EXAMPLES = r"""
+- name: Install the development packages
+  deamen.general.package_set:
+    names: "{{ dev_packages + essential_packages }}"
+
+- name: Install podman, with the docker emulation packages when enabled
+  deamen.general.package_set:
+    names: "{{ podman_default_pkgs + (podman_docker_pkgs if emulate_docker else []) }}"
+"""
+
+RETURN = r"""
+manager:
+  description: The package manager used.
+  returned: always
+  type: str
+  sample: dnf
+installed:
+  description: The packages that were installed, or would be in check mode.
+  returned: always
+  type: list
+  elements: str
+  sample: ["jq", "tmux"]
+present:
+  description: The packages that were already installed.
+  returned: always
+  type: list
+  elements: str
+  sample: ["git", "tar"]
+msg:
+  description: A message describing what happened.
+  returned: always
+  type: str
+  sample: "Installed 2 of 4 packages"
+"""
+
+from ansible.module_utils.basic import AnsibleModule
+
+# Package managers in detection order, with the package database to query and
+# the arguments to install packages
+MANAGERS = {
+    "dnf5": ("rpm", ["install", "-y"]),
+    "dnf": ("rpm", ["install", "-y"]),
+    "microdnf": ("rpm", ["install", "-y"]),
+    "yum": ("rpm", ["install", "-y"]),
+    "apt-get": ("dpkg", ["install", "-y", "-q"]),
+    "apk": ("apk", ["add"]),
+}
+
+# The output of the package queries is parsed, so they run in the C locale
+C_LOCALE = {"LANG": "C", "LC_ALL": "C"}
+
+
+def find_manager(module, manager):
+    """
+    Return the name and path of the package manager to use.
+    """
+    names = list(MANAGERS) if manager == "auto" else [manager]
+    for name in names:
+        path = module.get_bin_path(name)
+        if path:
+            return name, path
+    module.fail_json(
+        msg=f"No supported package manager found, tried {', '.join(names)}"
+    )
+
+
+def missing_rpm(module, names):
+    """
+    Return the packages that no installed package provides, with a single rpm
+    query.
+    """
+    rpm = module.get_bin_path("rpm", required=True)
+    # rpm returns the number of missing packages
+    rc, out, err = module.run_command(
+        [rpm, "-q", "--whatprovides", "--qf", "%{NAME}\\n"] + names,
+        environ_update=C_LOCALE,
+    )
+    missing = set()
+    for line in out.splitlines():
+        if line.startswith("no package provides "):
+            missing.add(line[len("no package provides ") :].strip())
+    if rc != 0 and not missing:
+        module.fail_json(msg=f"Failed to query the installed packages: {err}", rc=rc)
+    return [name for name in names if name in missing]
+
+
+def dpkg_provides(module, dpkg_query):
+    """
+    Return the virtual packages provided by the installed packages, with a
+    single dpkg-query over every package.
+    """
+    rc, out, err = module.run_command(
+        [dpkg_query, "-W", "-f", "${db:Status-Abbrev}|${Provides}\\n"],
+        environ_update=C_LOCALE,
+    )
+    provided = set()
+    for line in out.splitlines():
+        status, sep, provides = line.partition("|")
+        if not sep or not status.startswith("ii"):
+            continue
+        # Provides: foo (= 1.0), bar
+        for item in provides.split(","):
+            if item.strip():
+                provided.add(item.split()[0])
+    return provided
+
+
+def missing_dpkg(module, names):
+    """
+    Return the packages that are not installed, with a single dpkg-query,
+    and a second one for the virtual packages when some names are not
+    installed packages.
+    """
+    dpkg_query = module.get_bin_path("dpkg-query", required=True)
+    # dpkg-query fails for unknown packages but still lists the others
+    rc, out, err = module.run_command(
+        [dpkg_query, "-W", "-f", "${Package} ${db:Status-Abbrev}\\n"] + names,
+        environ_update=C_LOCALE,
+    )
+    installed = set()
+    for line in out.splitlines():
+        fields = line.split()
+        if len(fields) == 2 and fields[1].startswith("ii"):
+            installed.add(fields[0])
+    missing = [name for name in names if name.split(":", 1)[0] not in installed]
+    if missing:
+        provided = dpkg_provides(module, dpkg_query)
+        missing = [name for name in missing if name.split(":", 1)[0] not in provided]
+    return missing
+
+
+def missing_apk(module, names):
+    """
+    Return the packages that are not installed, with a single apk query.
+    """
+    apk = module.get_bin_path("apk", required=True)
+    # apk lists the installed packages among the given ones
+    rc, out, err = module.run_command(
+        [apk, "info", "-e"] + names, environ_update=C_LOCALE
+    )
+    installed = set(out.split())
+    return [name for name in names if name not in installed]
+
+
+QUERIES = {
+    "rpm": missing_rpm,
+    "dpkg": missing_dpkg,
+    "apk": missing_apk,
+}
+
+
+def run_module():
+    module_args = dict(
+        names=dict(type="list", elements="str", required=True, aliases=["name"]),
+        manager=dict(
+            type="str",
+            default="auto",
+            choices=["auto"] + list(MANAGERS),
+        ),
+    )
+
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+
+    # The package lists of several roles may overlap
+    names = list(dict.fromkeys(n.strip() for n in module.params["names"] if n.strip()))
+
+    manager, path = find_manager(module, module.params["manager"])
+    query, install_args = MANAGERS[manager]
+
+    result = dict(changed=False, manager=manager, installed=[], present=names)
+    if not names:
+        module.exit_json(msg="No packages to install", **result)
+
+    missing = QUERIES[query](module, names)
+    result["installed"] = missing
+    result["present"] = [name for name in names if name not in missing]
+    result["changed"] = bool(missing)
+
+    if missing and not module.check_mode:
+        environ = dict(C_LOCALE)
+        if query == "dpkg":
+            environ["DEBIAN_FRONTEND"] = "noninteractive"
+        rc, out, err = module.run_command(
+            [path] + install_args + missing, environ_update=environ
+        )
+        if rc != 0:
+            module.fail_json(
+                msg=f"Failed to install {', '.join(missing)}",
+                rc=rc,
+                stdout=out,
+                stderr=err,
+                **result,
+            )
+
+    result["msg"] = (
+        f"{'Would install' if module.check_mode else 'Installed'} "
+        f"{len(missing)} of {len(names)} packages"
+    )
+    module.exit_json(**result)
+
+
+def main():
+    run_module()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+Helpers shared by the gpg modules to run gpg and parse its machine readable
+output, see doc/DETAILS in the GnuPG sources.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import re
+
+# Messages of gpg --list-keys when no key matches
+NO_KEY_ERRORS = ("No public key", "No secret key", "error reading key")
+
+
+def gpg_command(module, homedir=None):
+    """
+    Returns the gpg command line common to every call, non-interactive and
+    with the given home directory.
+    """
+    gpg = module.get_bin_path("gpg") or module.get_bin_path("gpg2", required=True)
+    cmd = [gpg, "--batch", "--no-tty"]
+    if homedir:
+        cmd += ["--homedir", homedir]
+    return cmd
+
+
+def unescape(value):
+    """
+    Decodes the C-style escapes (\\x3a) of a --with-colons field.
+    """
+    return re.sub(r"\\x([0-9a-fA-F]{2})", lambda m: chr(int(m.group(1), 16)), value)
+
+
+def parse_colons(output):
+    """
+    Parses the --with-colons listing of gpg into a list of keys, each with its
+    fingerprint, user IDs and subkeys.
+    """
+    keys = []
+    key = last = None
+    for line in output.splitlines():
+        fields = line.split(":")
+        fields += [""] * (20 - len(fields))
+        record = fields[0]
+
+        if record in ("pub", "sec", "sub", "ssb"):
+            item = {
+                "keyid": fields[4],
+                "fingerprint": None,
+                "algorithm": int(fields[3]) if fields[3].isdigit() else None,
+                "curve": fields[16] or None,
+                "capabilities": fields[11],
+                "validity": fields[1],
+                "created": int(fields[5]) if fields[5].isdigit() else None,
+                "expires": int(fields[6]) if fields[6].isdigit() else None,
+            }
+            if record in ("pub", "sec"):
+                item.update(
+                    {"secret": record == "sec", "ownertrust": fields[8] or None}
+                )
+                item.update({"uids": [], "subkeys": []})
+                key = item
+                keys.append(key)
+            elif key is not None:
+                key["subkeys"].append(item)
+            last = item
+        elif record == "fpr" and last is not None and last["fingerprint"] is None:
+            last["fingerprint"] = fields[9]
+        elif record == "uid" and key is not None:
+            key["uids"].append(unescape(fields[9]))
+
+    return keys
+
+
+def list_keys(module, cmd, patterns=(), secret=False):
+    """
+    Lists the public or secret keys matching the patterns, every key when
+    there are none. A pattern matching no key is not an error.
+    """
+    args = cmd + [
+        "--with-colons",
+        "--fixed-list-mode",
+        "--with-fingerprint",
+        "--with-subkey-fingerprint",
+        "--list-secret-keys" if secret else "--list-keys",
+    ]
+    if patterns:
+        args += ["--"] + list(patterns)
+
+    rc, stdout, stderr = module.run_command(args)
+    if rc != 0 and not any(error in stderr for error in NO_KEY_ERRORS):
+        module.fail_json(
+            msg=f"Failed to list the keys: {stderr.strip()}",
+            rc=rc,
+            stdout=stdout,
+            stderr=stderr,
+        )
+    return parse_colons(stdout)
+
+
+def status_lines(output, keyword):
+    """
+    Returns the arguments of the --status-fd lines with the given keyword.
+    """
+    prefix = f"[GNUPG:] {keyword}"
+    return [
+        line[len(prefix) :].split()
+        for line in output.splitlines()
+        if line == prefix or line.startswith(prefix + " ")
+    ]
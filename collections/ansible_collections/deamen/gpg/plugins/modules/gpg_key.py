@@ -0,0 +1,209 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+module: gpg_key
+short_description: Generate a GPG key pair with an encryption subkey
+description:
+  - Generates an Ed25519 signing primary key and a Curve25519 encryption subkey, unless a secret
+    key already exists for the email address.
+  - The primary key and the subkey are generated by a single C(gpg --batch --gen-key) call, with
+    the parameters passed on its standard input, so they are never written to disk.
+  - The keys are listed with C(--with-colons) and parsed by the module.
+version_added: "1.1.0"
+options:
+  real_name:
+    description:
+      - The real name of the user ID.
+    type: str
+    required: true
+  email:
+    description:
+      - The email address of the user ID.
+      - The key is only generated when there is no secret key with this exact email address.
+    type: str
+    required: true
+  comment:
+    description:
+      - The comment of the user ID.
+    type: str
+  expire_date:
+    description:
+      - The expiration of the keys, in any format of the C(Expire-Date) parameter of gpg, for
+        example V(0) for no expiration, V(1y) or V(2030-01-01).
+    type: str
+    default: "0"
+  passphrase:
+    description:
+      - The passphrase protecting the secret keys.
+      - The keys are not protected when not set.
+    type: str
+  encryption_subkey:
+    description:
+      - Generate a Curve25519 encryption subkey with the primary key.
+    type: bool
+    default: true
+  homedir:
+    description:
+      - The GnuPG home directory, the default one of the user running the module when not set.
+    type: path
+attributes:
+  check_mode:
+    support: full
+notes:
+  - Run the module as the user that should own the key, for example with C(become_user).
+  - Requires GnuPG 2.1.17 or later.
+author:
+  - Song Tang (@deamen)
+"""
+
+EXAMPLES = r"""
+- name: Generate a GPG key for alice
+  deamen.gpg.gpg_key:
+    real_name: Alice Example
+    email: alice@example.com
+  become: true
+  become_user: alice
+  register: alice_key
+
+- name: Show the fingerprint
+  ansible.builtin.debug:
+    msg: "{{ alice_key.fingerprint }}"
+"""
+
+RETURN = r"""
+fingerprint:
+  description: The fingerprint of the primary key, generated or already existing.
+  returned: success, except in check mode when the key would be generated
+  type: str
+  sample: 3A1F4E0C9D7B2E8F6A5C4B3D2E1F0A9B8C7D6E5F
+subkeys:
+  description: The fingerprints of the subkeys.
+  returned: success, except in check mode when the key would be generated
+  type: list
+  elements: str
+  sample: ["7E6D5C4B3A29181706F5E4D3C2B1A09F8E7D6C5B"]
+"""
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.deamen.gpg.plugins.module_utils.gpg import (
+    gpg_command,
+    list_keys,
+    status_lines,
+)
+
+
+def find_key(module, cmd, email):
+    """
+    Returns the first secret key with the exact email address, None if there
+    is none.
+    """
+    keys = list_keys(module, cmd, [f"<{email}>"], secret=True)
+    return keys[0] if keys else None
+
+
+def key_parameters(params):
+    """
+    Returns the unattended key generation parameters of gpg.
+    """
+    lines = [
+        "Key-Type: eddsa",
+        "Key-Curve: Ed25519",
+        "Key-Usage: sign",
+    ]
+    if params["encryption_subkey"]:
+        lines += [
+            "Subkey-Type: ecdh",
+            "Subkey-Curve: Cv25519",
+            "Subkey-Usage: encrypt",
+        ]
+    lines += [
+        f"Name-Real: {params['real_name']}",
+        f"Name-Email: {params['email']}",
+    ]
+    if params["comment"]:
+        lines.append(f"Name-Comment: {params['comment']}")
+    lines.append(f"Expire-Date: {params['expire_date']}")
+    if params["passphrase"]:
+        lines.append(f"Passphrase: {params['passphrase']}")
+    else:
+        lines.append("%no-protection")
+    lines.append("%commit")
+    return "\n".join(lines) + "\n"
+
+
+def generate_key(module, cmd):
+    """
+    Generates the key pair and returns the fingerprint of the primary key.
+    """
+    args = cmd + ["--status-fd", "1", "--pinentry-mode", "loopback", "--gen-key"]
+    rc, stdout, stderr = module.run_command(
+        args, data=key_parameters(module.params), binary_data=True
+    )
+
+    created = status_lines(stdout, "KEY_CREATED")
+    if rc != 0 or not created:
+        module.fail_json(
+            msg=f"Failed to generate the key: {stderr.strip()}",
+            rc=rc,
+            stderr=stderr,
+        )
+    # KEY_CREATED <type> <fingerprint>
+    return created[0][1]
+
+
+def main():
+    module_args = dict(
+        real_name=dict(type="str", required=True),
+        email=dict(type="str", required=True),
+        comment=dict(type="str"),
+        expire_date=dict(type="str", default="0"),
+        passphrase=dict(type="str", no_log=True),
+        encryption_subkey=dict(type="bool", default=True),
+        homedir=dict(type="path"),
+    )
+
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+
+    # Each value is a line of the parameters gpg reads on its standard input
+    for name in ("real_name", "email", "comment", "passphrase"):
+        if "\n" in (module.params[name] or ""):
+            module.fail_json(msg=f"{name} must not contain a line break")
+
+    cmd = gpg_command(module, module.params["homedir"])
+    email = module.params["email"]
+
+    key = find_key(module, cmd, email)
+    if key:
+        module.exit_json(
+            changed=False,
+            msg=f"A secret key already exists for {email}",
+            fingerprint=key["fingerprint"],
+            subkeys=[subkey["fingerprint"] for subkey in key["subkeys"]],
+        )
+
+    if module.check_mode:
+        module.exit_json(changed=True, msg=f"Would generate a key for {email}")
+
+    fingerprint = generate_key(module, cmd)
+
+    # The subkey fingerprints are not in the status lines of gpg
+    keys = list_keys(module, cmd, [fingerprint], secret=True)
+    subkeys = [subkey["fingerprint"] for key in keys for subkey in key["subkeys"]]
+
+    module.exit_json(
+        changed=True,
+        msg=f"Generated a key for {email}",
+        fingerprint=fingerprint,
+        subkeys=subkeys,
+    )
+
+
+if __name__ == "__main__":
+    main()
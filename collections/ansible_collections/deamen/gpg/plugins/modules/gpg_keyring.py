@@ -0,0 +1,262 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+module: gpg_keyring
+short_description: Import GPG keys and set their owner trust in bulk
+description:
+  - Ensures that a list of keys is in the GPG keyring of the user, with the given owner trust.
+  - The keyring and the owner trust database are read once for all the keys.
+  - The missing keys are imported by a single C(gpg --import) call, and the owner trust of all
+    the keys is set by a single C(gpg --import-ownertrust) call, with the trust on its standard
+    input.
+version_added: "1.1.0"
+options:
+  keys:
+    description:
+      - The keys to manage.
+    type: list
+    elements: dict
+    required: true
+    suboptions:
+      fingerprint:
+        description:
+          - The full fingerprint of the primary key.
+        type: str
+        required: true
+      path:
+        description:
+          - The path of a key file on the managed host to import the key from when it is missing.
+        type: path
+      content:
+        description:
+          - The key, ASCII armored, to import when it is missing.
+          - Mutually exclusive with O(keys[].path).
+        type: str
+      secret:
+        description:
+          - Whether the secret key must be in the keyring, not only the public key.
+        type: bool
+        default: false
+      trust:
+        description:
+          - The owner trust of the key.
+          - The owner trust is left unchanged when not set.
+        type: str
+        choices: [undefined, never, marginal, full, ultimate]
+  homedir:
+    description:
+      - The GnuPG home directory, the default one of the user running the module when not set.
+    type: path
+attributes:
+  check_mode:
+    support: full
+notes:
+  - Run the module as the user that owns the keyring, for example with C(become_user).
+  - A missing key without O(keys[].path) or O(keys[].content) fails the module.
+author:
+  - Song Tang (@deamen)
+"""
+
+EXAMPLES = r"""
+- name: Import the signing key of alice and trust it ultimately
+  deamen.gpg.gpg_keyring:
+    keys:
+      - fingerprint: AABBCCDDEEFF00112233445566778899AABBCCDD
+        path: /home/alice/.gnupg/private_gpg.key
+        secret: true
+        trust: ultimate
+      - fingerprint: 00112233445566778899AABBCCDDEEFF00112233
+        content: "{{ lookup('ansible.builtin.file', 'bob.asc') }}"
+        trust: full
+  become: true
+  become_user: alice
+"""
+
+RETURN = r"""
+imported:
+  description: The fingerprints of the keys imported, or that would be in check mode.
+  returned: always
+  type: list
+  elements: str
+  sample: ["AABBCCDDEEFF00112233445566778899AABBCCDD"]
+trusted:
+  description: The fingerprints of the keys whose owner trust was set, or would be in check mode.
+  returned: always
+  type: list
+  elements: str
+  sample: ["AABBCCDDEEFF00112233445566778899AABBCCDD"]
+msg:
+  description: A message describing what happened.
+  returned: always
+  type: str
+  sample: "Imported 1 key, set the owner trust of 1 key"
+"""
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.deamen.gpg.plugins.module_utils.gpg import (
+    gpg_command,
+    list_keys,
+    status_lines,
+)
+
+# Owner trust values of gpg --export-ownertrust
+TRUST_LEVELS = {
+    "undefined": 2,
+    "never": 3,
+    "marginal": 4,
+    "full": 5,
+    "ultimate": 6,
+}
+
+
+def read_ownertrust(module, cmd):
+    """
+    Returns the owner trust of every key of the trust database, by fingerprint.
+    """
+    rc, stdout, stderr = module.run_command(cmd + ["--export-ownertrust"])
+    if rc != 0:
+        module.fail_json(msg=f"Failed to read the owner trust: {stderr.strip()}", rc=rc)
+
+    trust = {}
+    for line in stdout.splitlines():
+        if line.startswith("#"):
+            continue
+        fields = line.split(":")
+        if len(fields) >= 2 and fields[1].isdigit():
+            trust[fields[0].upper()] = int(fields[1])
+    return trust
+
+
+def import_keys(module, cmd, keys):
+    """
+    Imports the keys from their files and contents with a single gpg call,
+    failing when gpg does not report one of them as imported.
+    """
+    paths = list(dict.fromkeys(key["path"] for key in keys if key["path"]))
+    contents = [key["content"] for key in keys if key["content"]]
+
+    args = cmd + ["--status-fd", "1", "--import", "--"] + paths
+    data = None
+    if contents:
+        # The key contents are read from the standard input
+        args.append("-")
+        data = "\n".join(content.strip() for content in contents) + "\n"
+
+    rc, stdout, stderr = module.run_command(args, data=data, binary_data=True)
+    # gpg fails when some keys of a file are skipped, the status lines tell
+    # which ones were imported
+    imported = {fields[1].upper() for fields in status_lines(stdout, "IMPORT_OK")}
+    missing = [key["fingerprint"] for key in keys if key["fingerprint"] not in imported]
+    if missing:
+        module.fail_json(
+            msg=f"Failed to import the keys {', '.join(missing)}: {stderr.strip()}",
+            rc=rc,
+            stderr=stderr,
+        )
+
+
+def main():
+    module_args = dict(
+        keys=dict(
+            type="list",
+            elements="dict",
+            required=True,
+            no_log=False,
+            options=dict(
+                fingerprint=dict(type="str", required=True),
+                path=dict(type="path"),
+                content=dict(type="str", no_log=True),
+                secret=dict(type="bool", default=False),
+                trust=dict(type="str", choices=list(TRUST_LEVELS)),
+            ),
+            mutually_exclusive=[("path", "content")],
+        ),
+        homedir=dict(type="path"),
+    )
+
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+
+    keys = module.params["keys"]
+    for key in keys:
+        key["fingerprint"] = key["fingerprint"].replace(" ", "").upper()
+
+    cmd = gpg_command(module, module.params["homedir"])
+    fingerprints = list(dict.fromkeys(key["fingerprint"] for key in keys))
+
+    # The keyring and the trust database are read once for all the keys
+    public = {key["fingerprint"] for key in list_keys(module, cmd, fingerprints)}
+    secret = set()
+    if any(key["secret"] for key in keys):
+        secret = {
+            key["fingerprint"]
+            for key in list_keys(module, cmd, fingerprints, secret=True)
+        }
+    ownertrust = read_ownertrust(module, cmd)
+
+    to_import = [
+        key
+        for key in keys
+        if key["fingerprint"] not in (secret if key["secret"] else public)
+    ]
+    without_source = [
+        key["fingerprint"] for key in to_import if not (key["path"] or key["content"])
+    ]
+    if without_source:
+        module.fail_json(
+            msg="Keys not in the keyring, without path or content: "
+            + ", ".join(without_source)
+        )
+
+    trust = {}
+    for key in keys:
+        level = TRUST_LEVELS.get(key["trust"])
+        if level is not None and ownertrust.get(key["fingerprint"]) != level:
+            trust[key["fingerprint"]] = level
+
+    imported = list(dict.fromkeys(key["fingerprint"] for key in to_import))
+    trusted = list(trust)
+
+    if not module.check_mode:
+        if to_import:
+            import_keys(module, cmd, to_import)
+
+        if trust:
+            data = "".join(f"{fpr}:{level}:\n" for fpr, level in trust.items())
+            rc, stdout, stderr = module.run_command(
+                cmd + ["--import-ownertrust"], data=data, binary_data=True
+            )
+            if rc != 0:
+                module.fail_json(
+                    msg=f"Failed to set the owner trust: {stderr.strip()}",
+                    rc=rc,
+                    stderr=stderr,
+                    imported=imported,
+                )
+
+    if imported or trusted:
+        msg = (
+            f"{'Would import' if module.check_mode else 'Imported'} "
+            f"{len(imported)} key{'s' if len(imported) != 1 else ''}, "
+            f"set the owner trust of {len(trusted)} "
+            f"key{'s' if len(trusted) != 1 else ''}"
+        )
+    else:
+        msg = "The keys are already in the keyring with their owner trust"
+
+    module.exit_json(
+        changed=bool(imported or trusted),
+        msg=msg,
+        imported=imported,
+        trusted=trusted,
+    )
+
+
+if __name__ == "__main__":
+    main()
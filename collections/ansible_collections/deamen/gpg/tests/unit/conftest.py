@@ -0,0 +1,54 @@
+"""Shared fixtures of the deamen.gpg unit tests."""
+
+import os
+import sys
+
+import pytest
+
+# Add the collections path, so the modules import their module_utils as
+# installed
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "..", "..", "..", "..")
+)
+
+
+class FakeModule:
+    """
+    Stand-in for AnsibleModule, run_command returns the canned result of the
+    first gpg option of the command found in outputs.
+    """
+
+    def __init__(self, params=None, check_mode=False, outputs=None):
+        self.params = params or {}
+        self.check_mode = check_mode
+        self.outputs = outputs or {}
+        self.calls = []
+        self.result = None
+
+    def get_bin_path(self, name, required=False):
+        return f"/usr/bin/{name}"
+
+    def run_command(self, args, data=None, binary_data=False):
+        self.calls.append((args, data))
+        for option, output in self.outputs.items():
+            if option in args:
+                return output
+        return (0, "", "")
+
+    def called(self, option):
+        """Returns the commands run with the given option."""
+        return [call for call in self.calls if option in call[0]]
+
+    def fail_json(self, **kwargs):
+        # emulate AnsibleModule.fail_json by raising an exception with the payload
+        raise RuntimeError(kwargs)
+
+    def exit_json(self, **kwargs):
+        self.result = kwargs
+        raise SystemExit(0)
+
+
+@pytest.fixture
+def make_module():
+    """Returns a factory of FakeModule instances."""
+    return FakeModule
@@ -0,0 +1,106 @@
+"""Unit tests for the gpg module utils."""
+
+import pytest
+
+from ansible_collections.deamen.gpg.plugins.module_utils import gpg
+
+FPR = "58E9E1EDCDF7B0B801849FB61E8C4D240EE0E2E2"
+SUB_FPR = "0F2C6A3BDF4E8A1C9B7D5E3F1A2B4C6D8E0F1A2B"
+
+# gpg --with-colons --fixed-list-mode --with-fingerprint --with-subkey-fingerprint
+SECRET_KEYS = f"""sec:u:255:22:1E8C4D240EE0E2E2:1700000000:::u:::scESC:::+::ed25519:::0:
+fpr:::::::::{FPR}:
+grp:::::::::5A1B2C3D4E5F60718293A4B5C6D7E8F901234567:
+uid:u::::1700000000::2B4C6D8E0F1A2B4C6D8E0F1A2B4C6D8E0F1A2B4C::Test \\x3a User <test@example.com>::::::::::0:
+ssb:u:255:18:9B7D5E3F1A2B4C6D:1700000000:1800000000:::::e:::+::cv25519::
+fpr:::::::::{SUB_FPR}:
+grp:::::::::7654321098FEDCBA7654321098FEDCBA76543210:
+"""
+
+
+class TestParseColons:
+    """Test the parsing of the --with-colons listing."""
+
+    def test_secret_key(self):
+        """A secret key with its user ID and encryption subkey."""
+        (key,) = gpg.parse_colons(SECRET_KEYS)
+        assert key["fingerprint"] == FPR
+        assert key["keyid"] == "1E8C4D240EE0E2E2"
+        assert key["secret"] is True
+        assert key["ownertrust"] == "u"
+        assert key["algorithm"] == 22
+        assert key["curve"] == "ed25519"
+        assert key["created"] == 1700000000
+        assert key["expires"] is None
+        assert key["uids"] == ["Test : User <test@example.com>"]
+
+        (subkey,) = key["subkeys"]
+        assert subkey["fingerprint"] == SUB_FPR
+        assert subkey["capabilities"] == "e"
+        assert subkey["curve"] == "cv25519"
+        assert subkey["expires"] == 1800000000
+
+    def test_public_keys(self):
+        """Several public keys are listed apart, the keygrips are ignored."""
+        output = SECRET_KEYS.replace("sec:", "pub:").replace("ssb:", "sub:")
+        keys = gpg.parse_colons(output + output.replace(FPR, "A" * 40))
+        assert [key["fingerprint"] for key in keys] == [FPR, "A" * 40]
+        assert keys[0]["secret"] is False
+
+    def test_empty(self):
+        """No key is listed."""
+        assert gpg.parse_colons("") == []
+
+
+class TestListKeys:
+    """Test the gpg key listing."""
+
+    def test_patterns(self, make_module):
+        """The patterns follow the options, after --."""
+        module = make_module(outputs={"--list-secret-keys": (0, SECRET_KEYS, "")})
+        keys = gpg.list_keys(module, ["gpg"], [FPR], secret=True)
+        assert [key["fingerprint"] for key in keys] == [FPR]
+        args = module.calls[0][0]
+        assert args[-2:] == ["--", FPR]
+
+    @pytest.mark.parametrize("error", gpg.NO_KEY_ERRORS)
+    def test_no_key(self, make_module, error):
+        """A pattern matching no key is not an error."""
+        module = make_module(outputs={"--list-keys": (2, "", f"gpg: {error}\n")})
+        assert gpg.list_keys(module, ["gpg"], [FPR]) == []
+
+    def test_failure(self, make_module):
+        """Other gpg failures fail the module."""
+        module = make_module(outputs={"--list-keys": (2, "", "gpg: keydb broken\n")})
+        with pytest.raises(RuntimeError, match="keydb broken"):
+            gpg.list_keys(module, ["gpg"])
+
+
+class TestHelpers:
+    """Test the command line and status line helpers."""
+
+    def test_gpg_command(self, make_module):
+        """The home directory is passed to every gpg call."""
+        cmd = gpg.gpg_command(make_module(), "/home/alice/.gnupg")
+        assert cmd == [
+            "/usr/bin/gpg",
+            "--batch",
+            "--no-tty",
+            "--homedir",
+            "/home/alice/.gnupg",
+        ]
+
+    def test_status_lines(self):
+        """Only the lines of the keyword are returned, without the keyword."""
+        output = (
+            "[GNUPG:] IMPORT_OK 1 AAAA\n"
+            "[GNUPG:] IMPORT_OK_EXTRA 1\n"
+            "gpg: key imported\n"
+            "[GNUPG:] IMPORT_OK 17 BBBB\n"
+            "[GNUPG:] IMPORT_OK\n"
+        )
+        assert gpg.status_lines(output, "IMPORT_OK") == [
+            ["1", "AAAA"],
+            ["17", "BBBB"],
+            [],
+        ]
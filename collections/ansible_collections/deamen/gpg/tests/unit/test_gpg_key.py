@@ -0,0 +1,87 @@
+"""Unit tests for the gpg_key module."""
+
+import pytest
+
+from ansible_collections.deamen.gpg.plugins.modules import gpg_key
+
+FPR = "58E9E1EDCDF7B0B801849FB61E8C4D240EE0E2E2"
+
+PARAMS = {
+    "real_name": "Alice Example",
+    "email": "alice@example.com",
+    "comment": None,
+    "expire_date": "0",
+    "passphrase": None,
+    "encryption_subkey": True,
+    "homedir": None,
+}
+
+
+class TestKeyParameters:
+    """Test the unattended key generation parameters."""
+
+    def test_defaults(self):
+        """An Ed25519 key with a Curve25519 subkey, without protection."""
+        assert gpg_key.key_parameters(PARAMS).splitlines() == [
+            "Key-Type: eddsa",
+            "Key-Curve: Ed25519",
+            "Key-Usage: sign",
+            "Subkey-Type: ecdh",
+            "Subkey-Curve: Cv25519",
+            "Subkey-Usage: encrypt",
+            "Name-Real: Alice Example",
+            "Name-Email: alice@example.com",
+            "Expire-Date: 0",
+            "%no-protection",
+            "%commit",
+        ]
+
+    def test_options(self):
+        """The comment and passphrase are passed, without a subkey."""
+        params = dict(
+            PARAMS,
+            comment="work",
+            passphrase="secret",
+            encryption_subkey=False,
+            expire_date="1y",
+        )
+        lines = gpg_key.key_parameters(params).splitlines()
+        assert "Subkey-Type: ecdh" not in lines
+        assert "Name-Comment: work" in lines
+        assert "Expire-Date: 1y" in lines
+        assert "Passphrase: secret" in lines
+        assert "%no-protection" not in lines
+
+
+class TestGenerateKey:
+    """Test the parsing of the gpg key generation status."""
+
+    def test_key_created(self, make_module):
+        """The fingerprint of the primary key is read from KEY_CREATED."""
+        status = f"[GNUPG:] KEY_CONSIDERED {FPR} 0\n[GNUPG:] KEY_CREATED B {FPR}\n"
+        module = make_module(params=PARAMS, outputs={"--gen-key": (0, status, "")})
+        assert gpg_key.generate_key(module, ["gpg"]) == FPR
+        ((args, data),) = module.calls
+        assert "--pinentry-mode" in args
+        assert data == gpg_key.key_parameters(PARAMS)
+
+    def test_not_created(self, make_module):
+        """A run without KEY_CREATED fails the module."""
+        module = make_module(
+            params=PARAMS, outputs={"--gen-key": (0, "", "gpg: agent_genkey failed")}
+        )
+        with pytest.raises(RuntimeError, match="agent_genkey failed"):
+            gpg_key.generate_key(module, ["gpg"])
+
+
+class TestMain:
+    """Test the checks of the module arguments."""
+
+    @pytest.mark.parametrize("name", ["real_name", "email", "comment", "passphrase"])
+    def test_line_break(self, make_module, monkeypatch, name):
+        """A value with a line break could inject generation parameters."""
+        module = make_module(params=dict(PARAMS, **{name: "x\n%no-protection"}))
+        monkeypatch.setattr(gpg_key, "AnsibleModule", lambda **kwargs: module)
+        with pytest.raises(RuntimeError, match=f"{name} must not contain"):
+            gpg_key.main()
+        assert module.calls == []
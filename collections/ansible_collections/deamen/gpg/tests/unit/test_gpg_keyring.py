@@ -0,0 +1,189 @@
+"""Unit tests for the gpg_keyring module."""
+
+import pytest
+
+from ansible_collections.deamen.gpg.plugins.modules import gpg_keyring
+
+FPR = "58E9E1EDCDF7B0B801849FB61E8C4D240EE0E2E2"
+OTHER = "0F2C6A3BDF4E8A1C9B7D5E3F1A2B4C6D8E0F1A2B"
+
+NO_KEY = (2, "", "gpg: error reading key: No public key\n")
+
+# gpg --export-ownertrust
+OWNERTRUST = f"""# List of assigned trustvalues, created Tue 14 Nov 2023
+# (Use "gpg --import-ownertrust" to restore them)
+{FPR}:6:
+{OTHER.lower()}:4:
+"""
+
+
+def colons(record, fingerprint):
+    """Returns the --with-colons listing of a key."""
+    return (
+        f"{record}:u:255:22:{fingerprint[-16:]}:1700000000:::u:::scESC:::::ed25519:::0:\n"
+        f"fpr:::::::::{fingerprint}:\n"
+    )
+
+
+def key(fingerprint, **options):
+    """Returns a key of the keys option with its defaults."""
+    return dict(
+        {
+            "fingerprint": fingerprint,
+            "path": None,
+            "content": None,
+            "secret": False,
+            "trust": None,
+        },
+        **options,
+    )
+
+
+def run(monkeypatch, module):
+    """Runs the module and returns its result."""
+    monkeypatch.setattr(gpg_keyring, "AnsibleModule", lambda **kwargs: module)
+    with pytest.raises(SystemExit):
+        gpg_keyring.main()
+    return module.result
+
+
+class TestReadOwnertrust:
+    """Test the parsing of the owner trust database."""
+
+    def test_parse(self, make_module):
+        """Comments are skipped and fingerprints upper-cased."""
+        module = make_module(outputs={"--export-ownertrust": (0, OWNERTRUST, "")})
+        assert gpg_keyring.read_ownertrust(module, ["gpg"]) == {FPR: 6, OTHER: 4}
+
+    def test_failure(self, make_module):
+        """A failure to export the owner trust fails the module."""
+        module = make_module(outputs={"--export-ownertrust": (2, "", "trustdb broken")})
+        with pytest.raises(RuntimeError, match="trustdb broken"):
+            gpg_keyring.read_ownertrust(module, ["gpg"])
+
+
+class TestImportKeys:
+    """Test the single gpg call importing the missing keys."""
+
+    def test_paths_and_contents(self, make_module):
+        """Files are given as arguments, contents on the standard input."""
+        status = f"[GNUPG:] IMPORT_OK 1 {FPR}\n[GNUPG:] IMPORT_OK 1 {OTHER}\n"
+        module = make_module(outputs={"--import": (0, status, "")})
+        gpg_keyring.import_keys(
+            module,
+            ["gpg"],
+            [
+                key(FPR, path="/tmp/a.asc"),
+                key(OTHER, content="-----BEGIN PGP PUBLIC KEY BLOCK-----\n"),
+            ],
+        )
+        ((args, data),) = module.calls
+        assert args[-3:] == ["--", "/tmp/a.asc", "-"]
+        assert data == "-----BEGIN PGP PUBLIC KEY BLOCK-----\n"
+
+    def test_not_imported(self, make_module):
+        """A key gpg did not report as imported fails the module."""
+        status = f"[GNUPG:] IMPORT_OK 1 {FPR}\n"
+        module = make_module(outputs={"--import": (2, status, "gpg: no valid data")})
+        with pytest.raises(RuntimeError, match=OTHER):
+            gpg_keyring.import_keys(
+                module,
+                ["gpg"],
+                [key(FPR, path="/tmp/a.asc"), key(OTHER, path="/tmp/b.asc")],
+            )
+
+
+class TestMain:
+    """Test the planning of the imports and owner trust changes."""
+
+    def test_import_and_trust(self, make_module, monkeypatch):
+        """A missing key is imported and trusted, with a single call each."""
+        module = make_module(
+            params={
+                "keys": [key(FPR.lower(), path="/tmp/a.asc", trust="ultimate")],
+                "homedir": None,
+            },
+            outputs={
+                "--list-keys": NO_KEY,
+                "--export-ownertrust": (0, "", ""),
+                "--import": (0, f"[GNUPG:] IMPORT_OK 1 {FPR}\n", ""),
+            },
+        )
+        result = run(monkeypatch, module)
+        assert result["changed"] is True
+        assert result["imported"] == [FPR]
+        assert result["trusted"] == [FPR]
+        ((args, data),) = module.called("--import-ownertrust")
+        assert data == f"{FPR}:6:\n"
+
+    def test_up_to_date(self, make_module, monkeypatch):
+        """Nothing is imported nor trusted when the keyring is up to date."""
+        module = make_module(
+            params={
+                "keys": [
+                    key(FPR, secret=True, trust="ultimate"),
+                    key(OTHER, trust="marginal"),
+                ],
+                "homedir": None,
+            },
+            outputs={
+                "--list-secret-keys": (0, colons("sec", FPR), ""),
+                "--list-keys": (0, colons("pub", FPR) + colons("pub", OTHER), ""),
+                "--export-ownertrust": (0, OWNERTRUST, ""),
+            },
+        )
+        result = run(monkeypatch, module)
+        assert result["changed"] is False
+        assert module.called("--import") == []
+        assert module.called("--import-ownertrust") == []
+
+    def test_public_key_is_not_secret(self, make_module, monkeypatch):
+        """A key with only its public part is imported when the secret is required."""
+        module = make_module(
+            params={
+                "keys": [key(FPR, path="/tmp/a.asc", secret=True)],
+                "homedir": None,
+            },
+            outputs={
+                "--list-secret-keys": NO_KEY,
+                "--list-keys": (0, colons("pub", FPR), ""),
+                "--export-ownertrust": (0, "", ""),
+                "--import": (0, f"[GNUPG:] IMPORT_OK 17 {FPR}\n", ""),
+            },
+        )
+        result = run(monkeypatch, module)
+        assert result["imported"] == [FPR]
+        assert result["trusted"] == []
+
+    def test_check_mode(self, make_module, monkeypatch):
+        """Nothing is imported nor trusted in check mode."""
+        module = make_module(
+            check_mode=True,
+            params={
+                "keys": [
+                    key(FPR, path="/tmp/a.asc", trust="full"),
+                    key(OTHER, trust="full"),
+                ],
+                "homedir": None,
+            },
+            outputs={
+                "--list-keys": (0, colons("pub", OTHER), ""),
+                "--export-ownertrust": (0, OWNERTRUST, ""),
+            },
+        )
+        result = run(monkeypatch, module)
+        assert result["changed"] is True
+        assert result["imported"] == [FPR]
+        assert result["trusted"] == [FPR, OTHER]
+        assert result["msg"].startswith("Would import")
+        assert module.called("--import") == []
+        assert module.called("--import-ownertrust") == []
+
+    def test_missing_without_source(self, make_module, monkeypatch):
+        """A missing key without path or content fails the module."""
+        module = make_module(
+            params={"keys": [key(FPR)], "homedir": None},
+            outputs={"--list-keys": NO_KEY, "--export-ownertrust": (0, "", "")},
+        )
+        with pytest.raises(RuntimeError, match="without path or content"):
+            run(monkeypatch, module)
@@ -14,20 +14,85 @@ short_description: Manage subordinate UID and GID ranges for users
 description:
   - This module manages subordinate UID and GID ranges for users to enable rootless containers.
   - It automatically calculates the next available range and adds it to /etc/subuid and /etc/subgid.
-  - The module is idempotent and will not modify existing entries for a user.
+  - The module is idempotent, the existing entry of a user is kept. Existing entries are only
+    rewritten by O(reclaim), which drops the entries of removed users, and by
+    O(nested_container_remap), which rewrites the first entry of each file.
   - Supports check mode to preview changes without applying them.
 version_added: "1.0.0"
 options:
   username:
     description:
       - The username for which to add subordinate UID and GID ranges.
+      - Mutually exclusive with O(users) and O(nested_container_remap), one of them is required.
     type: str
-    required: true
+  users:
+    description:
+      - A list of usernames for which to add subordinate UID and GID ranges.
+      - Each file is read once and the ranges of all the users are allocated together, so they
+        never overlap.
+      - Mutually exclusive with O(username) and O(nested_container_remap), one of them is
+        required.
+    type: list
+    elements: str
+    version_added: "1.1.0"
   range_size:
     description:
       - The number of subordinate IDs to allocate for the user.
     type: int
     default: 65536
+  write_method:
+    description:
+      - How the new ranges are written.
+      - V(usermod) runs one C(usermod --add-subuids --add-subgids) command per user.
+      - V(direct) rewrites /etc/subuid and /etc/subgid once each, writing a temporary file
+        in the same directory and renaming it over the file.
+      - Use V(usermod) where the files must only be changed by shadow-utils.
+    type: str
+    choices: [usermod, direct]
+    default: usermod
+    version_added: "1.1.0"
+  allocation_strategy:
+    description:
+      - Where new ranges are allocated in the subordinate ID space.
+      - V(append) allocates after the highest allocated ID.
+      - V(first_fit) reuses the first free gap between existing ranges that is large enough.
+      - V(best_fit) reuses the smallest free gap that is large enough.
+      - V(first_fit) and V(best_fit) append when no gap is large enough.
+    type: str
+    choices: [append, first_fit, best_fit]
+    default: append
+    version_added: "1.1.0"
+  reclaim:
+    description:
+      - Remove the entries of the users that are no longer known to the system user database
+        before allocating, so their ranges can be reused by O(allocation_strategy).
+      - Requires O(write_method=direct).
+    type: bool
+    default: false
+    version_added: "1.1.0"
+  nested_container_remap:
+    description:
+      - Rewrite the range of the first entry of /etc/subuid and /etc/subgid to 10001-65535, for
+        podman running inside a rootless container, where only 65536 IDs are mapped and
+        newuidmap otherwise fails to write uid_map (Operation not permitted).
+      - The files of the managed host are read once each and written directly, each with a
+        temporary file renamed over it, after both were read.
+      - Files without any entry are left unchanged, with a warning.
+      - Mutually exclusive with O(username) and O(users).
+    type: bool
+    version_added: "1.1.0"
+  lock_timeout:
+    description:
+      - The number of seconds to wait for each lock before failing.
+      - The files are read and written under a lock that serializes the runs of this module.
+      - With O(write_method=direct) or O(nested_container_remap), the locks of shadow-utils are
+        also taken, C(/etc/.pwd.lock) as lckpwdf(3) does, then C(/etc/subuid.lock) and
+        C(/etc/subgid.lock). Stale locks left by processes that no longer run are removed.
+      - With O(write_method=usermod), the shadow-utils locks are taken by C(usermod).
+      - No lock is taken in check mode.
+    type: float
+    default: 15
+    version_added: "1.1.0"
 author:
   - Song Tang (@deamen)
 """
@@ -41,6 +106,22 @@ EXAMPLES = """
   deamen.podman.manage_subuid_subgid:
     username: containeruser
     range_size: 100000
+
+- name: Add subuid and subgid ranges for all the CI users at once
+  deamen.podman.manage_subuid_subgid:
+    users: "{{ ci_users }}"
+    write_method: direct
+
+- name: Remap the first entries for podman running inside a container
+  deamen.podman.manage_subuid_subgid:
+    nested_container_remap: true
+
+- name: Reuse the ranges of removed users for the new CI users
+  deamen.podman.manage_subuid_subgid:
+    users: "{{ ci_users }}"
+    write_method: direct
+    allocation_strategy: best_fit
+    reclaim: true
 """
 
 RETURN = """
@@ -56,70 +137,598 @@ msg:
   sample: "Subuids and subgids added for user podman: 100000-165535, 100000-165535"
 subuid_range:
   description: The subordinate UID range that was added or already exists
-  returned: always
+  returned: when O(username) is set
   type: dict
   sample: {"start": 100000, "end": 165535}
 subgid_range:
   description: The subordinate GID range that was added or already exists
-  returned: always
+  returned: when O(username) is set
   type: dict
   sample: {"start": 100000, "end": 165535}
+reclaimed:
+  description: The owners of the entries removed by O(reclaim)
+  returned: when O(reclaim) is true
+  type: list
+  elements: str
+  version_added: "1.1.0"
+  sample: ["olduser"]
+results:
+  description: The ranges of every user of O(users)
+  returned: when O(users) is set
+  type: list
+  elements: dict
+  version_added: "1.1.0"
+  contains:
+    username:
+      description: The username
+      type: str
+    changed:
+      description: Whether ranges were added for the user
+      type: bool
+    subuid_range:
+      description: The subordinate UID range that was added or already exists
+      type: dict
+    subgid_range:
+      description: The subordinate GID range that was added or already exists
+      type: dict
+  sample: [{"username": "ci1", "changed": true, "subuid_range": {"start": 100000, "end": 165535},
+            "subgid_range": {"start": 100000, "end": 165535}}]
+remapped:
+  description: The first entry of each file rewritten by O(nested_container_remap)
+  returned: when O(nested_container_remap) is true
+  type: list
+  elements: dict
+  version_added: "1.1.0"
+  contains:
+    file:
+      description: The subuid or subgid file
+      type: str
+    username:
+      description: The owner of the first entry
+      type: str
+    changed:
+      description: Whether the range of the entry was rewritten
+      type: bool
+    range:
+      description: The range of the entry
+      type: dict
+  sample: [{"file": "/etc/subuid", "username": "podman", "changed": true,
+            "range": {"start": 10001, "end": 65535}}]
+lock:
+  description: How long the module waited for the locks of the files
+  returned: always
+  type: dict
+  version_added: "1.1.0"
+  contains:
+    wait_time:
+      description: The number of seconds spent acquiring the locks
+      type: float
+    contention:
+      description: The number of attempts that found a lock held by another process
+      type: int
+    shadow:
+      description: Whether the shadow-utils locks were taken
+      type: bool
+  sample: {"wait_time": 0.001, "contention": 0, "shadow": true}
 """
 
 from ansible.module_utils.basic import AnsibleModule
+from array import array
+import bisect
+import errno
+import fcntl
+import mmap
 import os
+import pwd
+import tempfile
+import time
 
 # Use system defaults for subuid and subgid files
 SUBUID_FILE = "/etc/subuid"
 SUBGID_FILE = "/etc/subgid"
 
 
-def get_next_range(filepath, range_size):
+# Subordinate IDs are allocated from this ID onwards
+MIN_SUBID = 100000
+# Highest ID of the 32-bit ID space
+MAX_SUBID = 2**32 - 1
+
+ALLOCATION_STRATEGIES = ["append", "first_fit", "best_fit"]
+
+# Range of the first entry inside a container, so the IDs of the nested user
+# namespace stay within the 65536 IDs mapped to the container
+NESTED_SUBID_START = 10001
+NESTED_SUBID_COUNT = 55535
+
+# Files are scanned in chunks of this size
+CHUNK_SIZE = 1024 * 1024
+
+# Lock taken by lckpwdf(3), in the directory of SUBUID_FILE
+PWD_LOCK_NAME = ".pwd.lock"
+# Lock serializing the runs of this module, in the directory of SUBUID_FILE
+MODULE_LOCK_NAME = ".subid.lock"
+
+
+class SubIdIndex:
     """
-    Calculate the next available range from a subuid or subgid file.
+    Interval index of a subuid or subgid file, parsed in a single pass.
 
-    Args:
-        filepath: Path to the subuid or subgid file
-        range_size: Size of the range to allocate
+    Keeps the ranges of the users and the free gaps between the allocated
+    ranges, with a max tree over the gap sizes so a first-fit gap is found in
+    O(log n), and the gaps sorted by size so a best-fit gap is found in
+    O(log n).
 
-    Returns:
-        tuple: (start, end) of the next available range
+    The allocated intervals are packed as (start << 32 | end) integers in an
+    array('Q') instead of one Python object per entry, and only the ranges of
+    the users that are looked up are kept, so large files stay cheap to index.
     """
-    max_end = 0
 
-    if not os.path.exists(filepath):
-        # If file doesn't exist, start from a safe default
-        return (100000, 100000 + range_size - 1)
+    def __init__(self, entries=(), users=None):
+        """
+        Args:
+            entries: Iterable of (user, start, count) tuples
+            users: Users whose ranges are kept for has_entry(), all if None
+        """
+        self.users = {}
+        self.max_end = 0
 
-    try:
-        with open(filepath, "r") as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith("#"):
-                    continue
+        intervals = array("Q")
+        ordered = True
+        for user, start, count in entries:
+            end = start + count - 1
+            if users is None or user in users:
+                self.users.setdefault(user, []).append({"start": start, "end": end})
+            if end > self.max_end:
+                self.max_end = end
+            if start > MAX_SUBID or count <= 0:
+                continue
+            interval = start << 32 | min(end, MAX_SUBID)
+            if intervals and interval < intervals[-1]:
+                ordered = False
+            intervals.append(interval)
+
+        # Files written by append allocation are already sorted
+        if not ordered:
+            intervals = array("Q", sorted(intervals))
+
+        # Free gaps between the merged allocated intervals, above MIN_SUBID
+        self.gaps = []
+        cursor = MIN_SUBID
+        for interval in intervals:
+            start, end = interval >> 32, interval & MAX_SUBID
+            if start > cursor:
+                self.gaps.append([cursor, start - 1])
+            cursor = max(cursor, end + 1)
+
+        self._gap_starts = [start for start, end in self.gaps]
+        self._gap_sizes = sorted((end - start + 1, start) for start, end in self.gaps)
+        self._build_tree()
+
+    @classmethod
+    def from_file(cls, filepath, users=None):
+        """
+        Parse a subuid or subgid file, a missing file is an empty index.
+
+        Args:
+            filepath: Path to the subuid or subgid file
+            users: Users whose ranges are kept, all if None
+
+        Returns:
+            SubIdIndex: The index of the file
+        """
+        return cls(parse_entries(iter_lines(filepath)), users)
+
+    def _build_tree(self):
+        """Build the max tree over the sizes of the gaps."""
+        self._leaves = 1
+        while self._leaves < len(self.gaps):
+            self._leaves *= 2
+        self._tree = [0] * (2 * self._leaves)
+        for i, (start, end) in enumerate(self.gaps):
+            self._tree[self._leaves + i] = end - start + 1
+        for i in range(self._leaves - 1, 0, -1):
+            self._tree[i] = max(self._tree[2 * i], self._tree[2 * i + 1])
+
+    def _update_gap(self, i):
+        """Refresh the tree after the size of gap i changed."""
+        start, end = self.gaps[i]
+        node = self._leaves + i
+        self._tree[node] = end - start + 1
+        node //= 2
+        while node:
+            self._tree[node] = max(self._tree[2 * node], self._tree[2 * node + 1])
+            node //= 2
+
+    def has_entry(self, username):
+        """
+        Check if a user has an entry in the file.
+
+        Returns:
+            tuple: (bool, dict) - (has_entry, range_info) where range_info is the
+            first range of the user {"start": int, "end": int} or None
+        """
+        ranges = self.users.get(username)
+        if not ranges:
+            return (False, None)
+        return (True, dict(ranges[0]))
+
+    def next_range(self, range_size):
+        """
+        Return the range following the highest allocated ID.
 
-                parts = line.split(":")
-                if len(parts) != 3:
-                    continue
+        Returns:
+            tuple: (start, end) of the next available range
+        """
+        next_start = self.max_end if self.max_end == 0 else self.max_end + 1
+        # Ensure we start from at least MIN_SUBID for subordinate IDs
+        if next_start < MIN_SUBID:
+            next_start = MIN_SUBID
+
+        if next_start + range_size - 1 > MAX_SUBID:
+            raise RuntimeError(
+                f"No free range of {range_size} subordinate IDs left below {MAX_SUBID}"
+            )
+
+        return (next_start, next_start + range_size - 1)
+
+    def first_fit_gap(self, range_size):
+        """
+        Return the index of the first free gap that can hold range_size IDs.
+
+        Returns:
+            int: Index in self.gaps, None if no gap is large enough
+        """
+        if self._tree[1] < range_size:
+            return None
+
+        node = 1
+        while node < self._leaves:
+            node = 2 * node if self._tree[2 * node] >= range_size else 2 * node + 1
+        return node - self._leaves
+
+    def first_fit(self, range_size):
+        """
+        Return the first free range that can hold range_size IDs, reusing the
+        gaps left by removed entries before appending after the highest ID.
+
+        Returns:
+            tuple: (start, end) of the range
+        """
+        i = self.first_fit_gap(range_size)
+        if i is None:
+            return self.next_range(range_size)
+        start = self.gaps[i][0]
+        return (start, start + range_size - 1)
+
+    def best_fit(self, range_size):
+        """
+        Return a range from the smallest free gap that can hold range_size
+        IDs, appending after the highest ID when no gap is large enough.
+
+        Returns:
+            tuple: (start, end) of the range
+        """
+        i = bisect.bisect_left(self._gap_sizes, (range_size, 0))
+        if i == len(self._gap_sizes):
+            return self.next_range(range_size)
+        start = self._gap_sizes[i][1]
+        return (start, start + range_size - 1)
+
+    def allocate(self, username, range_size, strategy="append"):
+        """
+        Allocate a range to a user with the given strategy.
+
+        Args:
+            username: User to allocate the range to
+            range_size: Size of the range
+            strategy: One of ALLOCATION_STRATEGIES
+
+        Returns:
+            dict: The allocated range {"start": int, "end": int}
+        """
+        if strategy == "first_fit":
+            start, end = self.first_fit(range_size)
+        elif strategy == "best_fit":
+            start, end = self.best_fit(range_size)
+        else:
+            start, end = self.next_range(range_size)
+        self.add(username, start, end)
+        return {"start": start, "end": end}
 
+    def add(self, username, start, end):
+        """
+        Record a range allocated to a user so following lookups skip it.
+        """
+        self.users.setdefault(username, []).append({"start": start, "end": end})
+        if end > self.max_end:
+            self.max_end = end
+
+        # Allocations are taken from the start of a gap or after max_end
+        i = bisect.bisect_right(self._gap_starts, start) - 1
+        if i >= 0 and self.gaps[i][0] == start and self.gaps[i][1] >= end:
+            gap = self.gaps[i]
+            del self._gap_sizes[
+                bisect.bisect_left(self._gap_sizes, (gap[1] - gap[0] + 1, gap[0]))
+            ]
+            gap[0] = end + 1
+            if gap[0] <= gap[1]:
+                bisect.insort(self._gap_sizes, (gap[1] - gap[0] + 1, gap[0]))
+            self._gap_starts[i] = end + 1
+            self._update_gap(i)
+
+
+class SubIdLock:
+    """
+    Lock the subuid and subgid files for a read-compute-write sequence.
+
+    The runs of this module are always serialized with a lock of their own.
+    With shadow locking, the files are also locked the way shadow-utils does:
+    lckpwdf(3) semantics on /etc/.pwd.lock, then a /etc/subuid.lock and
+    /etc/subgid.lock hard link to a file holding the PID of the owner, where
+    locks left by dead processes are removed.
+
+    Shadow locking must not be used around usermod, which takes these locks
+    itself.
+    """
+
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, files, timeout, shadow=True):
+        """
+        Args:
+            files: The subuid and subgid files
+            timeout: Seconds to wait for each lock before failing
+            shadow: Also take the shadow-utils locks
+        """
+        self.files = files
+        self.timeout = timeout
+        self.shadow = shadow
+        self.wait_time = 0.0
+        self.contention = 0
+        self._fds = []
+        self._links = []
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def acquire(self):
+        """
+        Take every lock, waiting up to the timeout for each of them.
+        """
+        start = time.monotonic()
+        directory = os.path.dirname(self.files[0]) or "."
+        try:
+            self._lock_fd(os.path.join(directory, MODULE_LOCK_NAME))
+            if self.shadow:
+                self._lock_fd(os.path.join(directory, PWD_LOCK_NAME))
+                for filepath in self.files:
+                    self._lock_link(filepath)
+        except BaseException:
+            self.release()
+            raise
+        finally:
+            self.wait_time = time.monotonic() - start
+        return self
+
+    def metrics(self):
+        """
+        Return the contention metrics of the lock acquisition.
+        """
+        return {
+            "wait_time": round(self.wait_time, 3),
+            "contention": self.contention,
+            "shadow": self.shadow,
+        }
+
+    def _wait(self, deadline, lockpath):
+        """
+        Record a failed attempt and wait before the next one.
+        """
+        self.contention += 1
+        if time.monotonic() >= deadline:
+            raise RuntimeError(
+                f"Timed out after {self.timeout} seconds waiting for lock {lockpath}"
+            )
+        time.sleep(self.POLL_INTERVAL)
+
+    def _lock_fd(self, lockpath):
+        """
+        Take an fcntl write lock on a file, as lckpwdf(3) does.
+        """
+        try:
+            fd = os.open(lockpath, os.O_WRONLY | os.O_CREAT, 0o600)
+        except OSError as e:
+            raise RuntimeError(f"Failed to open lock {lockpath}: {str(e)}")
+
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except OSError as e:
+                if e.errno not in (errno.EACCES, errno.EAGAIN):
+                    os.close(fd)
+                    raise RuntimeError(f"Failed to lock {lockpath}: {str(e)}")
+                try:
+                    self._wait(deadline, lockpath)
+                except RuntimeError:
+                    os.close(fd)
+                    raise
+        self._fds.append(fd)
+
+    def _lock_link(self, filepath):
+        """
+        Create the <file>.lock hard link to a file holding our PID, removing
+        the lock of a process that no longer runs, as shadow-utils does.
+        """
+        lockpath = f"{filepath}.lock"
+        pidpath = f"{filepath}.{os.getpid()}"
+        try:
+            with open(pidpath, "w") as f:
+                f.write(f"{os.getpid()}\0")
+        except (IOError, OSError) as e:
+            raise RuntimeError(f"Failed to create lock {pidpath}: {str(e)}")
+
+        deadline = time.monotonic() + self.timeout
+        try:
+            while True:
                 try:
-                    start = int(parts[1])
-                    count = int(parts[2])
-                    end = start + count - 1
-                    if end > max_end:
-                        max_end = end
-                except (ValueError, IndexError):
-                    continue
-    except IOError as e:
+                    os.link(pidpath, lockpath)
+                    self._links.append(lockpath)
+                    return
+                except FileExistsError:
+                    if self._remove_stale(lockpath):
+                        continue
+                    self._wait(deadline, lockpath)
+                except OSError as e:
+                    raise RuntimeError(f"Failed to lock {filepath}: {str(e)}")
+        finally:
+            os.unlink(pidpath)
+
+    def _remove_stale(self, lockpath):
+        """
+        Remove a link lock whose owner process no longer exists.
+
+        Returns:
+            bool: Whether the lock was removed
+        """
+        try:
+            with open(lockpath) as f:
+                pid = int(f.read().strip("\0\n "))
+        except (IOError, OSError, ValueError):
+            return False
+
+        try:
+            os.kill(pid, 0)
+            return False
+        except ProcessLookupError:
+            pass
+        except PermissionError:
+            return False
+
+        try:
+            os.unlink(lockpath)
+        except FileNotFoundError:
+            pass
+        return True
+
+    def release(self):
+        """
+        Release every lock taken, in reverse order.
+        """
+        while self._links:
+            try:
+                os.unlink(self._links.pop())
+            except OSError:
+                pass
+        while self._fds:
+            fd = self._fds.pop()
+            try:
+                fcntl.lockf(fd, fcntl.LOCK_UN)
+            finally:
+                os.close(fd)
+
+
+def iter_lines(filepath):
+    """
+    Stream the lines of a subuid or subgid file, a missing file is empty.
+    The file is memory mapped and scanned in CHUNK_SIZE chunks, so only one
+    chunk is held in memory at a time.
+
+    Args:
+        filepath: Path to the subuid or subgid file
+
+    Yields:
+        str: Every line of the file, without its line ending
+    """
+    if not os.path.exists(filepath):
+        return
+
+    try:
+        with open(filepath, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                pending = b""
+                for offset in range(0, len(mm), CHUNK_SIZE):
+                    lines = (pending + mm[offset : offset + CHUNK_SIZE]).split(b"\n")
+                    pending = lines.pop()
+                    for line in lines:
+                        yield line.decode("utf-8", "surrogateescape")
+                if pending:
+                    yield pending.decode("utf-8", "surrogateescape")
+    except (IOError, OSError, ValueError) as e:
         # If we can't read the file, fail the module
         raise RuntimeError(f"Failed to read {filepath}: {str(e)}")
 
-    next_start = max_end if max_end == 0 else max_end + 1
-    # Ensure we start from at least 100000 for subordinate IDs
-    if next_start < 100000:
-        next_start = 100000
 
-    return (next_start, next_start + range_size - 1)
+def write_subid_file(module, filepath, lines):
+    """
+    Atomically replace a subuid or subgid file: the lines are written to a
+    temporary file in the same directory, which is then moved over the file
+    with atomic_move, keeping the owner, mode and SELinux context of an
+    existing file.
+
+    Args:
+        module: The Ansible module instance
+        filepath: Path to the subuid or subgid file
+        lines: Iterable of the lines of the new file, without line endings
+    """
+    directory = os.path.dirname(filepath) or "."
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(filepath)}.")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", errors="surrogateescape") as f:
+            for line in lines:
+                f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    except (IOError, OSError, RuntimeError) as e:
+        os.remove(tmp)
+        raise RuntimeError(f"Failed to write {filepath}: {str(e)}")
+
+    module.atomic_move(tmp, filepath)
+
+
+def parse_entries(lines):
+    """
+    Parse the lines of a subuid or subgid file.
+
+    Args:
+        lines: Iterable of lines
+
+    Yields:
+        tuple: (user, start, count) of every valid entry
+    """
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+
+        parts = line.split(":")
+        if len(parts) != 3:
+            continue
+
+        try:
+            yield (parts[0], int(parts[1]), int(parts[2]))
+        except ValueError:
+            continue
+
+
+def get_next_range(filepath, range_size):
+    """
+    Calculate the next available range from a subuid or subgid file.
+
+    Args:
+        filepath: Path to the subuid or subgid file
+        range_size: Size of the range to allocate
+
+    Returns:
+        tuple: (start, end) of the next available range
+    """
+    return SubIdIndex.from_file(filepath).next_range(range_size)
 
 
 def user_has_entry(filepath, username):
@@ -133,145 +742,429 @@ def user_has_entry(filepath, username):
     Returns:
         tuple: (bool, dict) - (has_entry, range_info) where range_info is {"start": int, "end": int} or None
     """
-    if not os.path.exists(filepath):
-        return (False, None)
+    return SubIdIndex.from_file(filepath, {username}).has_entry(username)
+
 
+def user_exists(name):
+    """
+    Check if an entry owner, a username or a UID, is a known user.
+    """
     try:
-        with open(filepath, "r") as f:
-            for line in f:
-                line = line.strip()
-                if line.startswith(username + ":"):
-                    parts = line.split(":")
-                    if len(parts) == 3:
-                        try:
-                            start = int(parts[1])
-                            count = int(parts[2])
-                            end = start + count - 1
-                            return (True, {"start": start, "end": end})
-                        except (ValueError, IndexError):
-                            continue
-    except IOError as e:
-        raise RuntimeError(f"Failed to read {filepath}: {str(e)}")
+        if name.isdigit():
+            pwd.getpwuid(int(name))
+        else:
+            pwd.getpwnam(name)
+    except KeyError:
+        return False
+    return True
+
+
+def reclaim_entries(entries, reclaimed):
+    """
+    Filter out the entries of the users that no longer exist.
 
-    return (False, None)
+    Args:
+        entries: Iterable of (user, start, count) tuples
+        reclaimed: Set updated with the owners of the removed entries
+
+    Yields:
+        tuple: (user, start, count) of the entries of existing users
+    """
+    known = {}
+    for entry in entries:
+        owner = entry[0]
+        if owner not in known:
+            known[owner] = user_exists(owner)
+        if known[owner]:
+            yield entry
+        else:
+            reclaimed.add(owner)
 
 
-def add_subuid_subgid_ranges(module, username, range_size):
+def allocate_ranges(index, usernames, range_size, strategy="append"):
     """
-    Add subordinate UID and GID ranges for a user using usermod command.
+    Allocate non-overlapping ranges in memory for the users without an entry.
+
+    Args:
+        index: SubIdIndex of the subuid or subgid file
+        usernames: Users that need a range
+        range_size: Size of the ranges to allocate
+        strategy: One of ALLOCATION_STRATEGIES
+
+    Returns:
+        dict: username -> (range_info, added) where added tells if the range
+        is new
+    """
+    ranges = {}
+    for username in usernames:
+        has_entry, info = index.has_entry(username)
+        if has_entry:
+            ranges[username] = (info, False)
+            continue
+        ranges[username] = (index.allocate(username, range_size, strategy), True)
+    return ranges
+
+
+def append_entries(module, filepath, ranges, reclaimed=()):
+    """
+    Append the new ranges to a subuid or subgid file with a single write,
+    dropping the entries of the reclaimed users. The file is streamed to the
+    new file and only written when there are new ranges or reclaimed entries.
+    """
+    lines = [
+        f"{username}:{info['start']}:{info['end'] - info['start'] + 1}"
+        for username, (info, added) in ranges.items()
+        if added
+    ]
+    if not lines and not reclaimed:
+        return
+
+    def new_lines():
+        for line in iter_lines(filepath):
+            entry = list(parse_entries([line])) if reclaimed else None
+            if entry and entry[0][0] in reclaimed:
+                continue
+            yield line
+        for line in lines:
+            yield line
+
+    write_subid_file(module, filepath, new_lines())
+
+
+def run_usermod(module, username, subuid, subgid):
+    """
+    Add the new ranges of a user with a single usermod command.
+    """
+    cmd = ["usermod"]
+    if subuid:
+        cmd.append(f"--add-subuids={subuid['start']}-{subuid['end']}")
+    if subgid:
+        cmd.append(f"--add-subgids={subgid['start']}-{subgid['end']}")
+    cmd.append(username)
+
+    rc, stdout, stderr = module.run_command(cmd, check_rc=False)
+    if rc != 0:
+        ids = " and ".join(
+            name for name, info in (("UIDs", subuid), ("GIDs", subgid)) if info
+        )
+        module.fail_json(
+            msg=f"Failed to add subordinate {ids} for user {username}",
+            rc=rc,
+            stdout=stdout,
+            stderr=stderr,
+            cmd=" ".join(cmd),
+        )
+
+
+def manage_ranges(
+    module,
+    usernames,
+    range_size,
+    write_method="usermod",
+    strategy="append",
+    reclaim=False,
+):
+    """
+    Add subordinate UID and GID ranges for the users that miss them.
+
+    Each file is read once, the ranges of every user are allocated in memory,
+    then written with usermod or, with the direct write method, with a single
+    atomic rewrite of each file.
 
     Args:
         module: AnsibleModule instance
-        username: Username to add ranges for
+        usernames: Usernames to add ranges for
         range_size: Size of ranges to allocate
+        write_method: 'usermod' or 'direct'
+        strategy: One of ALLOCATION_STRATEGIES
+        reclaim: Remove the entries of users that no longer exist first, so
+            their ranges can be reused; requires the direct write method
 
     Returns:
-        dict: Result dictionary with changed status and message
+        tuple: (results, reclaimed) - the result dictionary of every user and
+        the owners of the removed entries
     """
-    # Check if user already has entries
-    has_subuid, subuid_info = user_has_entry(SUBUID_FILE, username)
-    has_subgid, subgid_info = user_has_entry(SUBGID_FILE, username)
+    subuid_reclaimed = set()
+    subgid_reclaimed = set()
+    subuid_entries = parse_entries(iter_lines(SUBUID_FILE))
+    subgid_entries = parse_entries(iter_lines(SUBGID_FILE))
+    if reclaim:
+        subuid_entries = reclaim_entries(subuid_entries, subuid_reclaimed)
+        subgid_entries = reclaim_entries(subgid_entries, subgid_reclaimed)
 
-    if has_subuid and has_subgid:
-        return {
-            "changed": False,
-            "msg": f"User {username} already has subordinate UID and GID ranges configured",
-            "subuid_range": subuid_info,
-            "subgid_range": subgid_info,
-        }
+    # Only the ranges of the managed users are kept in memory
+    subuid_ranges = allocate_ranges(
+        SubIdIndex(subuid_entries, set(usernames)), usernames, range_size, strategy
+    )
+    subgid_ranges = allocate_ranges(
+        SubIdIndex(subgid_entries, set(usernames)), usernames, range_size, strategy
+    )
+    reclaimed = sorted(subuid_reclaimed | subgid_reclaimed)
 
-    # Calculate next available ranges
-    subuid_start, subuid_end = get_next_range(SUBUID_FILE, range_size)
-    subgid_start, subgid_end = get_next_range(SUBGID_FILE, range_size)
+    results = []
+    for username in usernames:
+        subuid, subuid_added = subuid_ranges[username]
+        subgid, subgid_added = subgid_ranges[username]
+        results.append(
+            {
+                "username": username,
+                "changed": subuid_added or subgid_added,
+                "subuid_range": subuid,
+                "subgid_range": subgid,
+            }
+        )
 
-    changed = False
+    if module.check_mode:
+        return (results, reclaimed)
 
-    # Add subuid range if not present
-    if not has_subuid:
-        if module.check_mode:
-            # In check mode, just report what would be done
-            changed = True
-        else:
-            cmd = ["usermod", f"--add-subuids={subuid_start}-{subuid_end}", username]
-            rc, stdout, stderr = module.run_command(cmd, check_rc=False)
-            if rc != 0:
-                module.fail_json(
-                    msg=f"Failed to add subordinate UIDs for user {username}",
-                    rc=rc,
-                    stdout=stdout,
-                    stderr=stderr,
-                    cmd=" ".join(cmd),
-                )
-            changed = True
+    if write_method == "direct":
+        append_entries(module, SUBUID_FILE, subuid_ranges, subuid_reclaimed)
+        append_entries(module, SUBGID_FILE, subgid_ranges, subgid_reclaimed)
     else:
-        subuid_start = subuid_info["start"]
-        subuid_end = subuid_info["end"]
-
-    # Add subgid range if not present
-    if not has_subgid:
-        if module.check_mode:
-            # In check mode, just report what would be done
-            changed = True
-        else:
-            cmd = ["usermod", f"--add-subgids={subgid_start}-{subgid_end}", username]
-            rc, stdout, stderr = module.run_command(cmd, check_rc=False)
-            if rc != 0:
-                module.fail_json(
-                    msg=f"Failed to add subordinate GIDs for user {username}",
-                    rc=rc,
-                    stdout=stdout,
-                    stderr=stderr,
-                    cmd=" ".join(cmd),
+        for username in usernames:
+            subuid, subuid_added = subuid_ranges[username]
+            subgid, subgid_added = subgid_ranges[username]
+            if subuid_added or subgid_added:
+                run_usermod(
+                    module,
+                    username,
+                    subuid if subuid_added else None,
+                    subgid if subgid_added else None,
                 )
-            changed = True
-    else:
-        subgid_start = subgid_info["start"]
-        subgid_end = subgid_info["end"]
 
-    result = {
-        "changed": changed,
-        "subuid_range": {"start": subuid_start, "end": subuid_end},
-        "subgid_range": {"start": subgid_start, "end": subgid_end},
-    }
+    return (results, reclaimed)
 
-    if changed:
-        if module.check_mode:
-            result["msg"] = (
-                f"Would add subordinate UID and GID ranges for user {username}: "
-                f"{subuid_start}-{subuid_end}, {subgid_start}-{subgid_end}"
-            )
-        else:
-            result["msg"] = (
-                f"Subordinate UID and GID ranges added for user {username}: "
-                f"{subuid_start}-{subuid_end}, {subgid_start}-{subgid_end}"
-            )
-    else:
+
+def add_subuid_subgid_ranges(
+    module,
+    username,
+    range_size,
+    write_method="usermod",
+    strategy="append",
+    reclaim=False,
+):
+    """
+    Add subordinate UID and GID ranges for a user.
+
+    Args:
+        module: AnsibleModule instance
+        username: Username to add ranges for
+        range_size: Size of ranges to allocate
+        write_method: 'usermod' or 'direct'
+        strategy: One of ALLOCATION_STRATEGIES
+        reclaim: Remove the entries of users that no longer exist first
+
+    Returns:
+        dict: Result dictionary with changed status and message
+    """
+    results, reclaimed = manage_ranges(
+        module, [username], range_size, write_method, strategy, reclaim
+    )
+    result = results[0]
+    del result["username"]
+    added = result["changed"]
+    if reclaim:
+        result["reclaimed"] = reclaimed
+        result["changed"] = added or bool(reclaimed)
+
+    subuid = result["subuid_range"]
+    subgid = result["subgid_range"]
+    ranges = f"{subuid['start']}-{subuid['end']}, {subgid['start']}-{subgid['end']}"
+
+    if not added and reclaimed:
+        result["msg"] = (
+            f"User {username} already has subordinate UID and GID ranges configured, "
+            f"{'would reclaim' if module.check_mode else 'reclaimed'} "
+            f"the ranges of {len(reclaimed)} removed users"
+        )
+    elif not added:
         result["msg"] = (
             f"User {username} already has subordinate UID and GID ranges configured"
         )
+    elif module.check_mode:
+        result["msg"] = (
+            f"Would add subordinate UID and GID ranges for user {username}: {ranges}"
+        )
+    else:
+        result["msg"] = (
+            f"Subordinate UID and GID ranges added for user {username}: {ranges}"
+        )
 
     return result
 
 
+def remap_first_entry(filepath):
+    """
+    Rewrite the range of the first entry of a file to the nested container
+    range, reading the file once.
+
+    Args:
+        filepath: Path to the subuid or subgid file
+
+    Returns:
+        tuple: (username, lines) where username is None when the file has no
+        entry and lines, the lines of the new file, is None when the entry
+        already has the nested container range
+    """
+    lines = list(iter_lines(filepath))
+    for i, line in enumerate(lines):
+        entry = next(parse_entries([line]), None)
+        if entry is None:
+            continue
+
+        username, start, count = entry
+        if (start, count) == (NESTED_SUBID_START, NESTED_SUBID_COUNT):
+            return username, None
+        lines[i] = f"{username}:{NESTED_SUBID_START}:{NESTED_SUBID_COUNT}"
+        return username, lines
+    return None, None
+
+
+def nested_container_remap(module):
+    """
+    Rewrite the first entry of the subuid and subgid files to the nested
+    container range. Both files are read before either is written, each is
+    replaced atomically.
+
+    Args:
+        module: The Ansible module instance
+
+    Returns:
+        dict: Result with changed status, message and the remapped entries
+    """
+    planned = []
+    for filepath in (SUBUID_FILE, SUBGID_FILE):
+        username, lines = remap_first_entry(filepath)
+        if username is None:
+            module.warn(f"No entry to remap in {filepath}")
+        planned.append((filepath, username, lines))
+
+    if not module.check_mode:
+        for filepath, username, lines in planned:
+            if lines is not None:
+                write_subid_file(module, filepath, lines)
+
+    subid_range = {
+        "start": NESTED_SUBID_START,
+        "end": NESTED_SUBID_START + NESTED_SUBID_COUNT - 1,
+    }
+    remapped = [
+        {
+            "file": filepath,
+            "username": username,
+            "changed": lines is not None,
+            "range": subid_range,
+        }
+        for filepath, username, lines in planned
+        if username is not None
+    ]
+    changed = [r["file"] for r in remapped if r["changed"]]
+
+    if changed:
+        msg = (
+            f"{'Would remap' if module.check_mode else 'Remapped'} the first entry "
+            f"of {', '.join(changed)} to {subid_range['start']}-{subid_range['end']}"
+        )
+    else:
+        msg = "The first entries already use the nested container range"
+    return {"changed": bool(changed), "msg": msg, "remapped": remapped}
+
+
 def main():
     """Main module execution."""
     module_args = {
-        "username": {"type": "str", "required": True},
+        "username": {"type": "str"},
+        "users": {"type": "list", "elements": "str"},
         "range_size": {"type": "int", "default": 65536},
+        "write_method": {
+            "type": "str",
+            "default": "usermod",
+            "choices": ["usermod", "direct"],
+        },
+        "allocation_strategy": {
+            "type": "str",
+            "default": "append",
+            "choices": ALLOCATION_STRATEGIES,
+        },
+        "reclaim": {"type": "bool", "default": False},
+        "lock_timeout": {"type": "float", "default": 15},
+        "nested_container_remap": {"type": "bool"},
     }
 
-    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+    module = AnsibleModule(
+        argument_spec=module_args,
+        mutually_exclusive=[("username", "users", "nested_container_remap")],
+        required_one_of=[("username", "users", "nested_container_remap")],
+        supports_check_mode=True,
+    )
+
+    remap = module.params["nested_container_remap"]
+    if remap is False:
+        module.fail_json(msg="one of the following is required: username, users")
 
-    username = module.params["username"]
     range_size = module.params["range_size"]
+    write_method = module.params["write_method"]
+    strategy = module.params["allocation_strategy"]
+    reclaim = module.params["reclaim"]
 
     # Validate range size
     if range_size <= 0:
         module.fail_json(msg="range_size must be a positive integer")
 
+    # usermod cannot remove the ranges of a user that no longer exists
+    if reclaim and write_method != "direct":
+        module.fail_json(msg="reclaim requires write_method=direct")
+
+    if module.params["lock_timeout"] < 0:
+        module.fail_json(msg="lock_timeout must not be negative")
+
+    # Other writers are locked out from reading the files to writing them,
+    # shadow-utils locks are left to usermod which takes them itself
+    lock = SubIdLock(
+        [SUBUID_FILE, SUBGID_FILE],
+        module.params["lock_timeout"],
+        shadow=write_method == "direct" or bool(remap),
+    )
+
     # Execute the main logic
-    result = add_subuid_subgid_ranges(module, username, range_size)
+    try:
+        # The files are not written in check mode
+        if not module.check_mode:
+            lock.acquire()
+        if remap:
+            result = nested_container_remap(module)
+        elif module.params["username"]:
+            result = add_subuid_subgid_ranges(
+                module,
+                module.params["username"],
+                range_size,
+                write_method,
+                strategy,
+                reclaim,
+            )
+        else:
+            # Duplicates would be allocated twice
+            usernames = list(dict.fromkeys(module.params["users"]))
+            results, reclaimed = manage_ranges(
+                module, usernames, range_size, write_method, strategy, reclaim
+            )
+            added = [r["username"] for r in results if r["changed"]]
+            result = {
+                "changed": bool(added) or bool(reclaimed),
+                "results": results,
+                "msg": (
+                    f"{'Would add' if module.check_mode else 'Added'} subordinate UID "
+                    f"and GID ranges for {len(added)} of {len(results)} users"
+                ),
+            }
+            if reclaim:
+                result["reclaimed"] = reclaimed
+    except RuntimeError as e:
+        module.fail_json(msg=str(e), lock=lock.metrics())
+    finally:
+        lock.release()
 
+    result["lock"] = lock.metrics()
     module.exit_json(**result)
 
 
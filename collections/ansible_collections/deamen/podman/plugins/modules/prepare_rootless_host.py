@@ -0,0 +1,311 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# GNU General Public License v3.0+
+# (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = """
+---
+module: prepare_rootless_host
+short_description: Prepare a host to run rootless podman containers
+description:
+  - Enables lingering for the user that runs the containers, so its user services start at boot
+    and keep running after logout.
+  - Sets the file capabilities of newuidmap and newgidmap, required to run rootless containers
+    inside a container where the setuid bit is not honoured.
+  - Everything is inspected in a single module run, and only the missing changes are applied.
+  - Supports check mode to preview changes without applying them.
+version_added: "1.1.0"
+options:
+  linger_user:
+    description:
+      - The user to enable lingering for.
+      - Lingering is left unchanged when not set.
+    type: str
+  capabilities:
+    description:
+      - Add C(cap_setuid) to O(newuidmap) and C(cap_setgid) to O(newgidmap), as permitted,
+        inheritable and effective capabilities. Other capabilities of the files are kept.
+    type: bool
+    default: false
+  newuidmap:
+    description:
+      - The path of the newuidmap binary.
+    type: path
+    default: /usr/bin/newuidmap
+  newgidmap:
+    description:
+      - The path of the newgidmap binary.
+    type: path
+    default: /usr/bin/newgidmap
+notes:
+  - Lingering is detected from /var/lib/systemd/linger and enabled with C(loginctl enable-linger).
+  - The capabilities are read and written directly in the C(security.capability) extended
+    attribute, without C(getcap) and C(setcap).
+attributes:
+  check_mode:
+    support: full
+author:
+  - Song Tang (@deamen)
+"""
+
+EXAMPLES = """
+- name: Enable lingering for the podman user
+  deamen.podman.prepare_rootless_host:
+    linger_user: podman
+
+- name: Allow newuidmap and newgidmap to map IDs inside a container
+  deamen.podman.prepare_rootless_host:
+    capabilities: true
+"""
+
+RETURN = """
+changed:
+  description: Whether the module made any changes
+  returned: always
+  type: bool
+  sample: true
+msg:
+  description: A message describing what happened
+  returned: always
+  type: str
+  sample: "Enabled lingering for podman"
+linger:
+  description: The lingering state of O(linger_user)
+  returned: when O(linger_user) is set
+  type: dict
+  contains:
+    user:
+      description: The user
+      type: str
+    changed:
+      description: Whether lingering was enabled
+      type: bool
+  sample: {"user": "podman", "changed": true}
+capabilities:
+  description: The capability set on each binary
+  returned: when O(capabilities) is true
+  type: list
+  elements: dict
+  contains:
+    path:
+      description: The path of the binary
+      type: str
+    capability:
+      description: The capability added
+      type: str
+    changed:
+      description: Whether the capability was added
+      type: bool
+  sample: [{"path": "/usr/bin/newuidmap", "capability": "cap_setuid", "changed": false}]
+"""
+
+from ansible.module_utils.basic import AnsibleModule
+import errno
+import os
+import struct
+
+# Directory holding a file per user with lingering enabled
+LINGER_DIR = "/var/lib/systemd/linger"
+
+# Extended attribute of the file capabilities, see capabilities(7)
+CAPABILITY_XATTR = "security.capability"
+CAP_SETGID = 6
+CAP_SETUID = 7
+
+# struct vfs_cap_data from linux/capability.h
+VFS_CAP_REVISION_MASK = 0xFF000000
+VFS_CAP_REVISION_2 = 0x02000000
+VFS_CAP_REVISION_3 = 0x03000000
+VFS_CAP_FLAGS_EFFECTIVE = 0x000001
+
+
+def linger_enabled(username):
+    """
+    Check whether lingering is enabled for a user.
+
+    Args:
+        username: The user to check
+
+    Returns:
+        bool: Whether lingering is enabled
+    """
+    return os.path.exists(os.path.join(LINGER_DIR, username))
+
+
+def enable_linger(module, username):
+    """
+    Enable lingering for a user, unless it is already enabled.
+
+    Args:
+        module: The Ansible module instance
+        username: The user to enable lingering for
+
+    Returns:
+        bool: Whether lingering was enabled
+    """
+    if linger_enabled(username):
+        return False
+
+    if not module.check_mode:
+        loginctl = module.get_bin_path("loginctl", required=True)
+        rc, stdout, stderr = module.run_command([loginctl, "enable-linger", username])
+        if rc != 0:
+            module.fail_json(
+                msg=f"Failed to enable lingering for {username}: {stderr}",
+                rc=rc,
+                stdout=stdout,
+                stderr=stderr,
+            )
+    return True
+
+
+def decode_capabilities(data):
+    """
+    Decode a security.capability extended attribute.
+
+    Args:
+        data: The raw attribute, None when the file has none
+
+    Returns:
+        tuple: (permitted, inheritable, effective, rootid) where permitted and
+        inheritable are 64-bit capability masks and rootid is None for a
+        revision 2 attribute
+    """
+    if not data:
+        return 0, 0, False, None
+
+    magic = struct.unpack_from("<I", data)[0]
+    revision = magic & VFS_CAP_REVISION_MASK
+    if revision == VFS_CAP_REVISION_2 and len(data) >= 20:
+        rootid = None
+    elif revision == VFS_CAP_REVISION_3 and len(data) >= 24:
+        rootid = struct.unpack_from("<I", data, 20)[0]
+    else:
+        raise RuntimeError(f"Unsupported file capabilities revision {revision >> 24}")
+
+    permitted_lo, inheritable_lo, permitted_hi, inheritable_hi = struct.unpack_from(
+        "<4I", data, 4
+    )
+    return (
+        permitted_hi << 32 | permitted_lo,
+        inheritable_hi << 32 | inheritable_lo,
+        bool(magic & VFS_CAP_FLAGS_EFFECTIVE),
+        rootid,
+    )
+
+
+def encode_capabilities(permitted, inheritable, effective, rootid=None):
+    """
+    Encode a security.capability extended attribute, as revision 3 when a
+    root ID is given and revision 2 otherwise.
+
+    Returns:
+        bytes: The raw attribute
+    """
+    revision = VFS_CAP_REVISION_2 if rootid is None else VFS_CAP_REVISION_3
+    magic = revision | (VFS_CAP_FLAGS_EFFECTIVE if effective else 0)
+    data = struct.pack(
+        "<5I",
+        magic,
+        permitted & 0xFFFFFFFF,
+        inheritable & 0xFFFFFFFF,
+        permitted >> 32,
+        inheritable >> 32,
+    )
+    if rootid is not None:
+        data += struct.pack("<I", rootid)
+    return data
+
+
+def add_capability(module, path, capability):
+    """
+    Add a capability to the permitted, inheritable and effective sets of a
+    file, keeping its other capabilities.
+
+    Args:
+        module: The Ansible module instance
+        path: The file to update
+        capability: The capability number
+
+    Returns:
+        bool: Whether the capability was added
+    """
+    try:
+        data = os.getxattr(path, CAPABILITY_XATTR)
+    except OSError as e:
+        if e.errno != errno.ENODATA:
+            raise RuntimeError(f"Failed to read the capabilities of {path}: {str(e)}")
+        data = None
+
+    permitted, inheritable, effective, rootid = decode_capabilities(data)
+    bit = 1 << capability
+    if permitted & bit and inheritable & bit and effective:
+        return False
+
+    if not module.check_mode:
+        try:
+            os.setxattr(
+                path,
+                CAPABILITY_XATTR,
+                encode_capabilities(permitted | bit, inheritable | bit, True, rootid),
+            )
+        except OSError as e:
+            raise RuntimeError(f"Failed to set the capabilities of {path}: {str(e)}")
+    return True
+
+
+def main():
+    """Main module execution."""
+    module_args = {
+        "linger_user": {"type": "str"},
+        "capabilities": {"type": "bool", "default": False},
+        "newuidmap": {"type": "path", "default": "/usr/bin/newuidmap"},
+        "newgidmap": {"type": "path", "default": "/usr/bin/newgidmap"},
+    }
+
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+
+    linger_user = module.params["linger_user"]
+    result = {"changed": False}
+    done = []
+
+    try:
+        if linger_user:
+            changed = enable_linger(module, linger_user)
+            result["linger"] = {"user": linger_user, "changed": changed}
+            if changed:
+                done.append(f"enabled lingering for {linger_user}")
+
+        if module.params["capabilities"]:
+            result["capabilities"] = []
+            for path, name, capability in (
+                (module.params["newuidmap"], "cap_setuid", CAP_SETUID),
+                (module.params["newgidmap"], "cap_setgid", CAP_SETGID),
+            ):
+                changed = add_capability(module, path, capability)
+                result["capabilities"].append(
+                    {"path": path, "capability": name, "changed": changed}
+                )
+                if changed:
+                    done.append(f"added {name} to {path}")
+    except RuntimeError as e:
+        module.fail_json(msg=str(e), **result)
+
+    result["changed"] = bool(done)
+    if done:
+        message = ", ".join(done)
+        if module.check_mode:
+            message = f"Would have {message}"
+        result["msg"] = message[0].upper() + message[1:]
+    else:
+        result["msg"] = "Host already prepared"
+
+    module.exit_json(**result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Benchmarks for the manage_subuid_subgid module.
+
+Generates synthetic subuid/subgid files, including comments and malformed
+lines, and times get_next_range(), user_has_entry() and
+add_subuid_subgid_ranges() with the DummyModule stub of the unit tests.
+
+Usage:
+    python tests/benchmark/bench_manage_subuid_subgid.py
+    python tests/benchmark/bench_manage_subuid_subgid.py --sizes 1000 10000 \\
+        --repeat 5 --output results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Add the module and unit tests paths
+sys.path.insert(0, os.path.join(HERE, "..", "..", "plugins", "modules"))
+sys.path.insert(0, os.path.join(HERE, "..", "unit"))
+
+import manage_subuid_subgid as ms
+
+from test_manage_subuid_subgid import DummyModule
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+RANGE_SIZE = 65536
+
+
+def collection_version():
+    """Return the version of the collection from galaxy.yml."""
+    with open(os.path.join(HERE, "..", "..", "galaxy.yml")) as f:
+        match = re.search(r'^version:\s*"?([^"\s]+)"?', f.read(), re.MULTILINE)
+    return match.group(1) if match else None
+
+
+def generate_file(filepath, entries):
+    """
+    Write a subuid/subgid file with the given number of entries.
+
+    Every 100th line is a comment and every 250th line is malformed. Ranges
+    are small enough that 1M entries fit in the 32-bit ID space, and every
+    10th range is left free to create gaps.
+    """
+    size = 1000
+    with open(filepath, "w") as f:
+        for i in range(entries):
+            if i % 100 == 0:
+                f.write(f"# generated entry {i}\n")
+            if i % 250 == 0:
+                f.write(f"malformed{i}:{i}\n")
+            if i % 10 == 9:
+                continue
+            f.write(f"user{i}:{ms.MIN_SUBID + i * size}:{size}\n")
+
+
+def time_call(func, repeat):
+    """Return the best, mean and worst duration of func in seconds."""
+    durations = timeit.repeat(func, number=1, repeat=repeat)
+    return {
+        "best": min(durations),
+        "mean": sum(durations) / len(durations),
+        "worst": max(durations),
+    }
+
+
+def time_with_setup(setup, func, repeat):
+    """Like time_call, running setup untimed before every call."""
+    durations = []
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return {
+        "best": min(durations),
+        "mean": sum(durations) / len(durations),
+        "worst": max(durations),
+    }
+
+
+def bench_size(workdir, entries, repeat):
+    """Run every benchmark on files with the given number of entries."""
+    source = os.path.join(workdir, f"subid-{entries}")
+    generate_file(source, entries)
+
+    uid_file = os.path.join(workdir, "subuid")
+    gid_file = os.path.join(workdir, "subgid")
+
+    def reset_files():
+        shutil.copyfile(source, uid_file)
+        shutil.copyfile(source, gid_file)
+
+    reset_files()
+    ms.SUBUID_FILE = uid_file
+    ms.SUBGID_FILE = gid_file
+
+    last_user = f"user{entries - 2}"
+    results = {
+        "entries": entries,
+        "file_size": os.path.getsize(source),
+        "get_next_range": time_call(
+            lambda: ms.get_next_range(uid_file, RANGE_SIZE), repeat
+        ),
+        "user_has_entry_hit": time_call(
+            lambda: ms.user_has_entry(uid_file, last_user), repeat
+        ),
+        "user_has_entry_miss": time_call(
+            lambda: ms.user_has_entry(uid_file, "missing"), repeat
+        ),
+        "add_existing_user": time_call(
+            lambda: ms.add_subuid_subgid_ranges(DummyModule(), last_user, RANGE_SIZE),
+            repeat,
+        ),
+        "add_user_usermod": time_call(
+            lambda: ms.add_subuid_subgid_ranges(DummyModule(), "newuser", RANGE_SIZE),
+            repeat,
+        ),
+        "add_user_direct_first_fit": time_with_setup(
+            reset_files,
+            lambda: ms.add_subuid_subgid_ranges(
+                DummyModule(), "newuser", 1000, "direct", "first_fit"
+            ),
+            repeat,
+        ),
+        "add_100_users_direct": time_with_setup(
+            reset_files,
+            lambda: ms.manage_ranges(
+                DummyModule(),
+                [f"new{i}" for i in range(100)],
+                RANGE_SIZE,
+                "direct",
+            ),
+            repeat,
+        ),
+    }
+
+    os.remove(source)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help="Number of entries of the generated files",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Number of runs of each benchmark"
+    )
+    parser.add_argument(
+        "--output", help="Write the JSON results to this file instead of stdout"
+    )
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-subid-")
+    try:
+        report = {
+            "collection_version": collection_version(),
+            "python_version": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": int(time.time()),
+            "repeat": args.repeat,
+            "results": [bench_size(workdir, size, args.repeat) for size in args.sizes],
+        }
+    finally:
+        shutil.rmtree(workdir)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
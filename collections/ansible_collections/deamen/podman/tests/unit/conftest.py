@@ -0,0 +1,49 @@
+"""Shared fixtures of the deamen.podman unit tests."""
+
+import os
+import shutil
+import sys
+
+import pytest
+
+# Add the module path
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "..", "plugins", "modules")
+)
+
+
+class DummyModule:
+    """Stand-in for AnsibleModule, run_command returns the queued results."""
+
+    def __init__(self, check_mode=False, run_commands=None):
+        self.check_mode = check_mode
+        self._calls = []
+        self._warnings = []
+        # queue of (rc, stdout, stderr) tuples to return for run_command
+        self._results = list(run_commands) if run_commands else []
+
+    def run_command(self, cmd, check_rc=False):
+        self._calls.append(cmd)
+        if self._results:
+            return self._results.pop(0)
+        return (0, "", "")
+
+    def warn(self, warning):
+        self._warnings.append(warning)
+
+    def atomic_move(self, src, dest):
+        # emulate AnsibleModule.atomic_move, which keeps the mode of an
+        # existing destination, its owner and SELinux context are left out
+        if os.path.exists(dest):
+            shutil.copystat(dest, src)
+        os.replace(src, dest)
+
+    def fail_json(self, **kwargs):
+        # emulate AnsibleModule.fail_json by raising an exception with the payload
+        raise RuntimeError(kwargs)
+
+
+@pytest.fixture
+def make_module():
+    """Returns a factory of DummyModule instances."""
+    return DummyModule
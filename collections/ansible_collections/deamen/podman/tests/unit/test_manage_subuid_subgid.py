@@ -1,36 +1,12 @@
 """Unit tests for manage_subuid_subgid module."""
 
-import sys
 import os
 
-# Add the module path
-sys.path.insert(
-    0, os.path.join(os.path.dirname(__file__), "..", "..", "plugins", "modules")
-)
-
 import manage_subuid_subgid as ms
 
 from manage_subuid_subgid import get_next_range, user_has_entry
 
 
-class DummyModule:
-    def __init__(self, check_mode=False, run_commands=None):
-        self.check_mode = check_mode
-        self._calls = []
-        # queue of (rc, stdout, stderr) tuples to return for run_command
-        self._results = list(run_commands) if run_commands else []
-
-    def run_command(self, cmd, check_rc=False):
-        self._calls.append(cmd)
-        if self._results:
-            return self._results.pop(0)
-        return (0, "", "")
-
-    def fail_json(self, **kwargs):
-        # emulate AnsibleModule.fail_json by raising an exception with the payload
-        raise RuntimeError(kwargs)
-
-
 class TestGetNextRange:
     """Test the get_next_range function."""
 
@@ -131,7 +107,7 @@ def test_basic():
     assert bool(1) is True
 
 
-def test_noop_when_both_entries_exist(tmp_path):
+def test_noop_when_both_entries_exist(make_module, tmp_path):
     """No-op when both subuid and subgid entries already exist for user."""
     uid_file = tmp_path / "subuid"
     gid_file = tmp_path / "subgid"
@@ -141,7 +117,7 @@ def test_noop_when_both_entries_exist(tmp_path):
     ms.SUBUID_FILE = str(uid_file)
     ms.SUBGID_FILE = str(gid_file)
 
-    module = DummyModule(check_mode=False)
+    module = make_module(check_mode=False)
     res = ms.add_subuid_subgid_ranges(module, "testuser", 65536)
 
     assert res["changed"] is False
@@ -151,7 +127,7 @@ def test_noop_when_both_entries_exist(tmp_path):
     assert module._calls == []
 
 
-def test_adds_only_missing_subgid(tmp_path):
+def test_adds_only_missing_subgid(make_module, tmp_path):
     """When subuid exists but subgid missing, only add subgid."""
     uid_file = tmp_path / "subuid"
     gid_file = tmp_path / "subgid"
@@ -162,7 +138,7 @@ def test_adds_only_missing_subgid(tmp_path):
     ms.SUBGID_FILE = str(gid_file)
 
     # Simulate successful usermod call for adding subgids
-    module = DummyModule(check_mode=False, run_commands=[(0, "", "")])
+    module = make_module(check_mode=False, run_commands=[(0, "", "")])
     res = ms.add_subuid_subgid_ranges(module, "testuser", 65536)
 
     assert res["changed"] is True
@@ -175,7 +151,7 @@ def test_adds_only_missing_subgid(tmp_path):
     assert res["subuid_range"]["start"] == 200000
 
 
-def test_check_mode_reports_change_without_run_command(tmp_path):
+def test_check_mode_reports_change_without_run_command(make_module, tmp_path):
     """In check mode, report changed=True and do not invoke run_command."""
     uid_file = tmp_path / "subuid"
     gid_file = tmp_path / "subgid"
@@ -184,7 +160,7 @@ def test_check_mode_reports_change_without_run_command(tmp_path):
     ms.SUBUID_FILE = str(uid_file)
     ms.SUBGID_FILE = str(gid_file)
 
-    module = DummyModule(check_mode=True)
+    module = make_module(check_mode=True)
     res = ms.add_subuid_subgid_ranges(module, "checkuser", 65536)
 
     assert res["changed"] is True
@@ -192,7 +168,7 @@ def test_check_mode_reports_change_without_run_command(tmp_path):
     assert module._calls == []
 
 
-def test_failure_returns_fail_json_on_usermod_error(tmp_path):
+def test_failure_returns_fail_json_on_usermod_error(make_module, tmp_path):
     """If usermod returns non-zero rc, module.fail_json is invoked with details."""
     uid_file = tmp_path / "subuid"
     gid_file = tmp_path / "subgid"
@@ -202,7 +178,7 @@ def test_failure_returns_fail_json_on_usermod_error(tmp_path):
     ms.SUBGID_FILE = str(gid_file)
 
     # Simulate failing usermod for subuid addition
-    module = DummyModule(check_mode=False, run_commands=[(2, "out", "err")])
+    module = make_module(check_mode=False, run_commands=[(2, "out", "err")])
 
     try:
         ms.add_subuid_subgid_ranges(module, "baduser", 65536)
@@ -215,3 +191,395 @@ def test_failure_returns_fail_json_on_usermod_error(tmp_path):
         assert payload["stdout"] == "out"
         assert "stderr" in payload
         assert payload["stderr"] == "err"
+
+
+class TestSubIdIndex:
+    """Test the SubIdIndex class."""
+
+    def test_single_pass_lookups(self):
+        """Entries, ranges and gaps are indexed from the parsed lines."""
+        index = ms.SubIdIndex(
+            ms.parse_entries(
+                [
+                    "# comment\n",
+                    "user1:100000:65536\n",
+                    "user3:296608:65536\n",
+                    "invalid line\n",
+                    "user2:231072:65536\n",
+                ]
+            )
+        )
+        assert index.has_entry("user2") == (True, {"start": 231072, "end": 296607})
+        assert index.has_entry("user4") == (False, None)
+        assert index.gaps == [[165536, 231071]]
+        assert index.next_range(65536) == (362144, 427679)
+
+    def test_first_fit_reuses_gap(self):
+        """The first gap large enough is reused before appending."""
+        index = ms.SubIdIndex(
+            [
+                ("user1", 100000, 1000),
+                ("user2", 102000, 1000),
+                ("user3", 200000, 65536),
+            ]
+        )
+        # gaps: 101000-101999 (1000) and 103000-199999 (97000)
+        assert index.first_fit(500) == (101000, 101499)
+        assert index.first_fit(65536) == (103000, 168535)
+        assert index.first_fit(100000) == (265536, 365535)
+
+    def test_add_updates_gaps(self):
+        """Allocated ranges are skipped by following lookups."""
+        index = ms.SubIdIndex([("user1", 100000, 1000), ("user2", 102000, 1000)])
+        start, end = index.first_fit(1000)
+        index.add("new1", start, end)
+        assert (start, end) == (101000, 101999)
+        assert index.first_fit(1000) == (103000, 103999)
+        assert index.has_entry("new1") == (True, {"start": 101000, "end": 101999})
+
+    def test_empty_index(self):
+        """An empty index allocates from MIN_SUBID."""
+        index = ms.SubIdIndex()
+        assert index.first_fit(65536) == (100000, 165535)
+        assert index.next_range(65536) == (100000, 165535)
+
+
+def test_usermod_adds_both_ranges_in_one_command(make_module, tmp_path):
+    """A user missing both ranges gets them from a single usermod command."""
+    ms.SUBUID_FILE = str(tmp_path / "subuid")
+    ms.SUBGID_FILE = str(tmp_path / "subgid")
+
+    module = make_module(check_mode=False)
+    res = ms.add_subuid_subgid_ranges(module, "newuser", 65536)
+
+    assert res["changed"] is True
+    assert module._calls == [
+        [
+            "usermod",
+            "--add-subuids=100000-165535",
+            "--add-subgids=100000-165535",
+            "newuser",
+        ]
+    ]
+
+
+def test_users_direct_write(make_module, tmp_path):
+    """Ranges of many users are allocated together and written once."""
+    uid_file = tmp_path / "subuid"
+    gid_file = tmp_path / "subgid"
+    uid_file.write_text("existing:100000:65536\n")
+    gid_file.write_text("existing:100000:65536")
+    uid_file.chmod(0o640)
+
+    ms.SUBUID_FILE = str(uid_file)
+    ms.SUBGID_FILE = str(gid_file)
+
+    module = make_module(check_mode=False)
+    results, reclaimed = ms.manage_ranges(
+        module, ["existing", "ci1", "ci2"], 1000, write_method="direct"
+    )
+
+    assert [r["changed"] for r in results] == [False, True, True]
+    assert results[1]["subuid_range"] == {"start": 165536, "end": 166535}
+    assert results[2]["subuid_range"] == {"start": 166536, "end": 167535}
+    assert module._calls == []
+    expected = "existing:100000:65536\nci1:165536:1000\nci2:166536:1000\n"
+    assert uid_file.read_text() == expected
+    assert gid_file.read_text() == expected
+    assert uid_file.stat().st_mode & 0o777 == 0o640
+    # no temporary file is left behind
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["subgid", "subuid"]
+
+
+def test_users_check_mode_does_not_write(make_module, tmp_path):
+    """In check mode the users ranges are reported but not written."""
+    uid_file = tmp_path / "subuid"
+    ms.SUBUID_FILE = str(uid_file)
+    ms.SUBGID_FILE = str(tmp_path / "subgid")
+
+    module = make_module(check_mode=True)
+    results, reclaimed = ms.manage_ranges(
+        module, ["ci1", "ci2"], 1000, write_method="direct"
+    )
+
+    assert all(r["changed"] for r in results)
+    assert not uid_file.exists()
+
+
+class TestAllocationStrategies:
+    """Test the allocation strategies of SubIdIndex."""
+
+    def index(self):
+        # gaps: 101000-104999 (4000), 106000-106999 (1000) then append at 200000
+        return ms.SubIdIndex(
+            [
+                ("user1", 100000, 1000),
+                ("user2", 105000, 1000),
+                ("user3", 107000, 93000),
+            ]
+        )
+
+    def test_append(self):
+        """append allocates after the highest ID."""
+        assert self.index().allocate("new", 1000) == {"start": 200000, "end": 200999}
+
+    def test_first_fit(self):
+        """first_fit allocates from the first gap large enough."""
+        index = self.index()
+        assert index.allocate("new1", 1000, "first_fit")["start"] == 101000
+        assert index.allocate("new2", 3000, "first_fit")["start"] == 102000
+        assert index.allocate("new3", 1000, "first_fit")["start"] == 106000
+        assert index.allocate("new4", 1000, "first_fit")["start"] == 200000
+
+    def test_best_fit(self):
+        """best_fit allocates from the smallest gap large enough."""
+        index = self.index()
+        assert index.allocate("new1", 1000, "best_fit")["start"] == 106000
+        assert index.allocate("new2", 1000, "best_fit")["start"] == 101000
+        assert index.allocate("new3", 3000, "best_fit")["start"] == 102000
+        assert index.allocate("new4", 1, "best_fit")["start"] == 200000
+
+    def test_id_space_exhausted(self):
+        """Allocating past the 32-bit ID space fails."""
+        index = ms.SubIdIndex([("user1", 100000, ms.MAX_SUBID - 100000)])
+        try:
+            index.allocate("new", 65536)
+            assert False, "Expected the allocation to fail"
+        except RuntimeError as exc:
+            assert "No free range" in str(exc)
+
+
+def test_reclaim_reuses_ranges_of_removed_users(make_module, tmp_path, monkeypatch):
+    """Entries of removed users are dropped and their ranges reused."""
+    content = "# managed\nalive:100000:65536\ngone:165536:65536\nlast:231072:65536\n"
+    uid_file = tmp_path / "subuid"
+    gid_file = tmp_path / "subgid"
+    uid_file.write_text(content)
+    gid_file.write_text(content)
+
+    ms.SUBUID_FILE = str(uid_file)
+    ms.SUBGID_FILE = str(gid_file)
+    monkeypatch.setattr(ms, "user_exists", lambda name: name != "gone")
+
+    module = make_module(check_mode=False)
+    res = ms.add_subuid_subgid_ranges(
+        module, "new", 65536, "direct", strategy="first_fit", reclaim=True
+    )
+
+    assert res["changed"] is True
+    assert res["reclaimed"] == ["gone"]
+    assert res["subuid_range"] == {"start": 165536, "end": 231071}
+    expected = "# managed\nalive:100000:65536\nlast:231072:65536\nnew:165536:65536\n"
+    assert uid_file.read_text() == expected
+    assert gid_file.read_text() == expected
+
+
+def test_reclaim_only(make_module, tmp_path, monkeypatch):
+    """A run that only reclaims ranges does not report them as added."""
+    content = "alive:100000:65536\ngone:165536:65536\n"
+    uid_file = tmp_path / "subuid"
+    gid_file = tmp_path / "subgid"
+    uid_file.write_text(content)
+    gid_file.write_text(content)
+
+    ms.SUBUID_FILE = str(uid_file)
+    ms.SUBGID_FILE = str(gid_file)
+    monkeypatch.setattr(ms, "user_exists", lambda name: name != "gone")
+
+    module = make_module(check_mode=False)
+    res = ms.add_subuid_subgid_ranges(module, "alive", 65536, "direct", reclaim=True)
+
+    assert res["changed"] is True
+    assert res["reclaimed"] == ["gone"]
+    assert "already has" in res["msg"]
+    assert "reclaimed the ranges of 1 removed users" in res["msg"]
+    assert uid_file.read_text() == "alive:100000:65536\n"
+
+
+def test_write_subid_file_uses_atomic_move(make_module, tmp_path):
+    """The file is replaced by atomic_move, which keeps its SELinux context."""
+    filepath = tmp_path / "subuid"
+    filepath.write_text("old:100000:65536\n")
+    module = make_module()
+    moves = []
+    module.atomic_move = lambda src, dest: moves.append(dest) or os.replace(src, dest)
+
+    ms.write_subid_file(module, str(filepath), ["new:100000:65536"])
+
+    assert moves == [str(filepath)]
+    assert filepath.read_text() == "new:100000:65536\n"
+    assert os.listdir(tmp_path) == ["subuid"]
+
+
+def test_iter_lines_across_chunks(tmp_path, monkeypatch):
+    """Lines split across chunk boundaries are reassembled."""
+    filepath = tmp_path / "subuid"
+    filepath.write_text("user1:100000:65536\nuser2:165536:65536\nuser3:231072:1")
+    monkeypatch.setattr(ms, "CHUNK_SIZE", 7)
+
+    assert list(ms.iter_lines(str(filepath))) == [
+        "user1:100000:65536",
+        "user2:165536:65536",
+        "user3:231072:1",
+    ]
+    assert get_next_range(str(filepath), 10) == (231073, 231082)
+
+
+def test_index_keeps_only_requested_users(tmp_path):
+    """Only the ranges of the requested users are kept in memory."""
+    filepath = tmp_path / "subuid"
+    filepath.write_text("".join(f"user{i}:{100000 + i * 10}:10\n" for i in range(1000)))
+
+    index = ms.SubIdIndex.from_file(str(filepath), {"user500"})
+
+    assert list(index.users) == ["user500"]
+    assert index.has_entry("user500") == (True, {"start": 105000, "end": 105009})
+    assert index.gaps == []
+    assert index.next_range(10) == (110000, 110009)
+
+
+class TestSubIdLock:
+    """Test the SubIdLock class."""
+
+    def files(self, tmp_path):
+        return [str(tmp_path / "subuid"), str(tmp_path / "subgid")]
+
+    def test_shadow_locks_released(self, tmp_path):
+        """The link locks exist while held and are removed on release."""
+        files = self.files(tmp_path)
+        with ms.SubIdLock(files, 1) as lock:
+            assert os.path.exists(files[0] + ".lock")
+            assert os.path.exists(files[1] + ".lock")
+            assert (tmp_path / ms.PWD_LOCK_NAME).exists()
+
+        assert not os.path.exists(files[0] + ".lock")
+        assert not os.path.exists(files[1] + ".lock")
+        assert sorted(os.listdir(tmp_path)) == [ms.PWD_LOCK_NAME, ms.MODULE_LOCK_NAME]
+        assert lock.metrics()["contention"] == 0
+
+    def test_module_lock_only_without_shadow(self, tmp_path):
+        """usermod takes the shadow-utils locks itself."""
+        files = self.files(tmp_path)
+        with ms.SubIdLock(files, 1, shadow=False):
+            assert not os.path.exists(files[0] + ".lock")
+            assert not (tmp_path / ms.PWD_LOCK_NAME).exists()
+
+    def test_held_lock_times_out(self, tmp_path):
+        """A lock held by a running process is waited for until the timeout."""
+        files = self.files(tmp_path)
+        (tmp_path / "subgid.lock").write_text(f"{os.getpid()}\0")
+
+        lock = ms.SubIdLock(files, 0.2)
+        try:
+            lock.acquire()
+            assert False, "Expected the lock to time out"
+        except RuntimeError as exc:
+            assert "waiting for lock" in str(exc)
+
+        assert lock.metrics()["contention"] > 1
+        assert lock.metrics()["wait_time"] >= 0.2
+        # The locks taken before the timeout are released
+        assert not os.path.exists(files[0] + ".lock")
+        assert (tmp_path / "subgid.lock").exists()
+
+    def test_stale_lock_removed(self, tmp_path):
+        """A lock left by a process that no longer runs is taken over."""
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0)
+        os.waitpid(pid, 0)
+
+        files = self.files(tmp_path)
+        (tmp_path / "subuid.lock").write_text(f"{pid}\0")
+
+        with ms.SubIdLock(files, 1) as lock:
+            assert (tmp_path / "subuid.lock").read_text() == f"{os.getpid()}\0"
+        assert lock.metrics()["contention"] == 0
+
+    def test_concurrent_allocations_do_not_overlap(self, make_module, tmp_path):
+        """Concurrent runs allocate distinct ranges."""
+        files = self.files(tmp_path)
+        for filepath in files:
+            with open(filepath, "w") as f:
+                f.write("base:100000:65536\n")
+        ms.SUBUID_FILE, ms.SUBGID_FILE = files
+
+        children = []
+        for i in range(4):
+            pid = os.fork()
+            if pid == 0:
+                # The child must never return into the test runner
+                try:
+                    with ms.SubIdLock(files, 10):
+                        ms.add_subuid_subgid_ranges(
+                            make_module(), f"user{i}", 1000, "direct"
+                        )
+                finally:
+                    os._exit(0)
+            children.append(pid)
+        for pid in children:
+            os.waitpid(pid, 0)
+
+        with open(files[0]) as f:
+            starts = [int(line.split(":")[1]) for line in f]
+        assert len(starts) == 5
+        assert sorted(starts) == [100000, 165536, 166536, 167536, 168536]
+
+
+class TestNestedContainerRemap:
+    """Test the nested_container_remap mode."""
+
+    def setup_files(self, tmp_path, uid_content, gid_content):
+        uid_file = tmp_path / "subuid"
+        gid_file = tmp_path / "subgid"
+        uid_file.write_text(uid_content)
+        gid_file.write_text(gid_content)
+        ms.SUBUID_FILE = str(uid_file)
+        ms.SUBGID_FILE = str(gid_file)
+        return uid_file, gid_file
+
+    def test_remaps_first_entry_of_both_files(self, make_module, tmp_path):
+        """Only the first entry is rewritten, comments are kept."""
+        uid_file, gid_file = self.setup_files(
+            tmp_path,
+            "# comment\npodman:100000:65536\nother:165536:65536\n",
+            "podman:524288:65536\n",
+        )
+
+        module = make_module()
+        res = ms.nested_container_remap(module)
+
+        assert res["changed"] is True
+        assert [(r["username"], r["changed"]) for r in res["remapped"]] == [
+            ("podman", True),
+            ("podman", True),
+        ]
+        assert uid_file.read_text() == (
+            "# comment\npodman:10001:55535\nother:165536:65536\n"
+        )
+        assert gid_file.read_text() == "podman:10001:55535\n"
+        assert module._calls == []
+
+    def test_already_remapped(self, make_module, tmp_path):
+        """Files already using the nested range are not written."""
+        uid_file, gid_file = self.setup_files(
+            tmp_path, "podman:10001:55535\n", "podman:10001:55535\n"
+        )
+        mtime = uid_file.stat().st_mtime_ns
+
+        res = ms.nested_container_remap(make_module())
+
+        assert res["changed"] is False
+        assert uid_file.stat().st_mtime_ns == mtime
+
+    def test_check_mode_and_missing_entries(self, make_module, tmp_path):
+        """Nothing is written in check mode, empty files are reported."""
+        uid_file, gid_file = self.setup_files(tmp_path, "podman:100000:65536\n", "")
+
+        module = make_module(check_mode=True)
+        res = ms.nested_container_remap(module)
+
+        assert res["changed"] is True
+        assert [r["file"] for r in res["remapped"]] == [str(uid_file)]
+        assert module._warnings == [f"No entry to remap in {gid_file}"]
+        assert uid_file.read_text() == "podman:100000:65536\n"
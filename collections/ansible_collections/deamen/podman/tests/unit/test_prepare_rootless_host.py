@@ -0,0 +1,114 @@
+"""Unit tests for prepare_rootless_host module."""
+
+import errno
+
+import prepare_rootless_host as prh
+
+
+class DummyXattrs:
+    """In-memory stand-in for os.getxattr and os.setxattr."""
+
+    def __init__(self, attrs=None):
+        self.attrs = dict(attrs or {})
+
+    def getxattr(self, path, name):
+        try:
+            return self.attrs[(path, name)]
+        except KeyError:
+            raise OSError(errno.ENODATA, "No data available")
+
+    def setxattr(self, path, name, value):
+        self.attrs[(path, name)] = value
+
+
+class TestCapabilities:
+    """Test the security.capability encoding."""
+
+    def test_encode_matches_setcap(self):
+        """cap_setuid=eip is encoded like setcap does."""
+        data = prh.encode_capabilities(1 << prh.CAP_SETUID, 1 << prh.CAP_SETUID, True)
+        assert data.hex() == "0100000280000000800000000000000000000000"
+
+    def test_decode_round_trip(self):
+        """Revision 3 attributes keep their root ID."""
+        data = prh.encode_capabilities(1 << 40 | 1, 1 << 6, False, rootid=100000)
+        assert len(data) == 24
+        assert prh.decode_capabilities(data) == (1 << 40 | 1, 1 << 6, False, 100000)
+
+    def test_decode_missing(self):
+        """A file without the attribute has no capabilities."""
+        assert prh.decode_capabilities(None) == (0, 0, False, None)
+
+    def test_decode_unsupported_revision(self):
+        """Revision 1 attributes are refused."""
+        try:
+            prh.decode_capabilities(b"\x00\x00\x00\x01" + b"\x00" * 8)
+            assert False, "Expected the revision to be refused"
+        except RuntimeError as exc:
+            assert "revision 1" in str(exc)
+
+    def test_add_keeps_other_capabilities(self, make_module, monkeypatch):
+        """The capability is added to the existing ones, once."""
+        existing = prh.encode_capabilities(1 << 12, 0, False)
+        xattrs = DummyXattrs({("/bin/newgidmap", prh.CAPABILITY_XATTR): existing})
+        monkeypatch.setattr(prh.os, "getxattr", xattrs.getxattr)
+        monkeypatch.setattr(prh.os, "setxattr", xattrs.setxattr)
+
+        module = make_module()
+        assert prh.add_capability(module, "/bin/newgidmap", prh.CAP_SETGID) is True
+        assert prh.add_capability(module, "/bin/newgidmap", prh.CAP_SETGID) is False
+
+        data = xattrs.attrs[("/bin/newgidmap", prh.CAPABILITY_XATTR)]
+        assert prh.decode_capabilities(data) == (1 << 12 | 1 << 6, 1 << 6, True, None)
+
+    def test_add_check_mode(self, make_module, monkeypatch):
+        """Nothing is written in check mode."""
+        xattrs = DummyXattrs()
+        monkeypatch.setattr(prh.os, "getxattr", xattrs.getxattr)
+        monkeypatch.setattr(prh.os, "setxattr", xattrs.setxattr)
+
+        module = make_module(check_mode=True)
+        assert prh.add_capability(module, "/bin/newuidmap", prh.CAP_SETUID) is True
+        assert xattrs.attrs == {}
+
+
+class TestLinger:
+    """Test the lingering helpers."""
+
+    def test_already_enabled(self, make_module, tmp_path, monkeypatch):
+        """No command runs when the linger file exists."""
+        monkeypatch.setattr(prh, "LINGER_DIR", str(tmp_path))
+        (tmp_path / "podman").write_text("")
+
+        module = make_module()
+        assert prh.enable_linger(module, "podman") is False
+        assert module._calls == []
+
+    def test_enable(self, make_module, tmp_path, monkeypatch):
+        """loginctl enables lingering for the user."""
+        monkeypatch.setattr(prh, "LINGER_DIR", str(tmp_path))
+
+        module = make_module()
+        module.get_bin_path = lambda name, required=False: f"/usr/bin/{name}"
+        assert prh.enable_linger(module, "podman") is True
+        assert module._calls == [["/usr/bin/loginctl", "enable-linger", "podman"]]
+
+    def test_enable_check_mode(self, make_module, tmp_path, monkeypatch):
+        """No command runs in check mode."""
+        monkeypatch.setattr(prh, "LINGER_DIR", str(tmp_path))
+
+        module = make_module(check_mode=True)
+        assert prh.enable_linger(module, "podman") is True
+        assert module._calls == []
+
+    def test_enable_failure(self, make_module, tmp_path, monkeypatch):
+        """A loginctl failure fails the module."""
+        monkeypatch.setattr(prh, "LINGER_DIR", str(tmp_path))
+
+        module = make_module(run_commands=[(1, "", "Could not enable linger")])
+        module.get_bin_path = lambda name, required=False: f"/usr/bin/{name}"
+        try:
+            prh.enable_linger(module, "podman")
+            assert False, "Expected the module to fail"
+        except RuntimeError as exc:
+            assert "Could not enable linger" in str(exc)